@@ -0,0 +1,241 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores de RBT12 de cada faixa do Simples Nacional (LC 123/2006)
+LIMITES_FAIXAS = np.array([180_000.0, 360_000.0, 720_000.0, 1_800_000.0, 3_600_000.0, 4_800_000.0])
+
+# Meses da janela móvel de receita e imposto
+MESES_JANELA = 12
+
+# Situação das linhas em que nenhuma regra vale
+SITUACAO_PADRAO = "Regular"
+
+# Arquivo JSON opcional com as regras de situação, no lugar de REGRAS_SITUACAO
+ARQUIVO_REGRAS = os.environ.get("ANALISE_REGRAS")
+
+# Indicadores calculados, na ordem em que são exibidos
+COLUNAS_INDICADORES = [
+    "saída 12m", "imposto 12m", "meses 12m", "alíquota efetiva", "alíquota 12m",
+    "entrada/saída", "faixa", "uso da faixa",
+]
+
+_OPERADORES = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+class RegraSituacao:
+    """
+    Regra que preenche a coluna Situação a partir dos valores e indicadores
+
+    A regra vale para a linha quando todas as `condicoes` são verdadeiras.
+    Cada condição é (coluna, operador, valor), com os operadores de
+    comparação (">", ">=", "<", "<=", "==", "!=") ou "vazio"/"preenchido",
+    que dispensam o valor; comparações com valores vazios são falsas. Em
+    cada linha vale a situação da primeira regra verdadeira, na ordem da lista.
+    """
+
+    __slots__ = ("situacao", "condicoes")
+
+    def __init__(self, situacao, condicoes):
+        self.situacao = situacao
+        self.condicoes = tuple(tuple(condicao) for condicao in condicoes)
+        for condicao in self.condicoes:
+            if condicao[1] not in _OPERADORES and condicao[1] not in ("vazio", "preenchido"):
+                raise ValueError(f"Operador desconhecido na regra '{situacao}': {condicao[1]}")
+
+    def mascara(self, colunas):
+        """
+        colunas: nome -> array numérico (NaN para vazio)
+        Retorna: array booleano das linhas em que a regra vale
+        """
+        mascara = None
+        for condicao in self.condicoes:
+            valores = colunas[condicao[0]]
+            operador = condicao[1]
+            if operador == "vazio":
+                atende = np.isnan(valores)
+            elif operador == "preenchido":
+                atende = ~np.isnan(valores)
+            else:
+                with np.errstate(invalid="ignore"):
+                    atende = _OPERADORES[operador](valores, condicao[2])
+            mascara = atende if mascara is None else mascara & atende
+        return mascara
+
+
+REGRAS_SITUACAO = [
+    RegraSituacao("Acima do limite do Simples", [("RBT12", ">", 4_800_000)]),
+    RegraSituacao("Próximo do limite do Simples", [("faixa", "==", 6), ("uso da faixa", ">=", 0.9)]),
+    RegraSituacao("Acima do sublimite de ICMS/ISS", [("RBT12", ">", 3_600_000)]),
+    RegraSituacao("Próximo da mudança de faixa", [("uso da faixa", ">=", 0.9)]),
+    RegraSituacao("Sem PGDAS no período", [("saída", "vazio"), ("entrada", "preenchido")]),
+    RegraSituacao("Receita sem imposto", [("saída", ">", 0), ("imposto", "vazio")]),
+    RegraSituacao("Receita sem imposto", [("alíquota efetiva", "==", 0)]),
+    RegraSituacao("Entradas acima da receita", [("entrada/saída", ">", 1)]),
+]
+
+
+def carregar_regras(caminho):
+    """
+    Lê regras de situação de um arquivo JSON:
+    [{"situacao": "...", "condicoes": [["coluna", "operador", valor], ...]}, ...]
+    """
+    with open(caminho, "r", encoding="utf-8") as f:
+        return [RegraSituacao(regra["situacao"], regra["condicoes"]) for regra in json.load(f)]
+
+
+def regras_em_vigor():
+    """
+    Regras do arquivo em ANALISE_REGRAS, ou as padrão se não houver ou se
+    o arquivo for inválido
+    """
+    if ARQUIVO_REGRAS:
+        try:
+            return carregar_regras(ARQUIVO_REGRAS)
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            logger.error(f"Regras de situação inválidas em {ARQUIVO_REGRAS}: {str(e)}")
+    return REGRAS_SITUACAO
+
+
+def _numerico(df, coluna):
+    if coluna not in df:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[coluna], errors="coerce").to_numpy(dtype=float)
+
+
+def _meses(periodos):
+    """
+    "MM/AAAA" -> número de meses desde o ano 0 (NaN se inválido)
+    Só os períodos distintos são convertidos
+    """
+    codigos, unicos = pd.factorize(periodos)
+    datas = pd.to_datetime(pd.Series(unicos, dtype=object), format="%m/%Y", errors="coerce")
+    meses_unicos = (datas.dt.year * 12 + datas.dt.month - 1).to_numpy(dtype=float)
+    return np.where(codigos >= 0, meses_unicos[codigos], np.nan)
+
+
+def _soma_janela(chave, valores, meses):
+    """
+    Soma móvel por grupo sobre chaves ordenadas (grupo * base + mês): para
+    cada linha, soma dos valores do mesmo grupo nos `meses` meses até ela,
+    com meses ausentes contando como zero
+    Retorna: (somas, quantidade de valores preenchidos na janela)
+    """
+    preenchidos = ~np.isnan(valores)
+    acumulado = np.concatenate(([0.0], np.cumsum(np.where(preenchidos, valores, 0.0))))
+    contagem = np.concatenate(([0], np.cumsum(preenchidos)))
+    inicio = np.searchsorted(chave, chave - (meses - 1), side="left")
+    fim = np.arange(1, len(chave) + 1)
+    return acumulado[fim] - acumulado[inicio], contagem[fim] - contagem[inicio]
+
+
+def _dividir(numerador, denominador):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominador > 0, numerador / denominador, np.nan)
+
+
+def calcular_indicadores(df, regras=None):
+    """
+    Indicadores por empresa e período sobre a tabela consolidada, sem laço
+    por linha nem groupby: as janelas de 12 meses saem de somas acumuladas
+    sobre as linhas ordenadas por empresa e mês
+
+    - saída/imposto 12m: somas nos 12 meses até o período (meses ausentes valem zero)
+    - meses 12m: meses com saída informada na janela
+    - alíquota efetiva: imposto / saída do período; alíquota 12m sobre as somas
+    - entrada/saída: razão entre entradas e receita do período
+    - faixa e uso da faixa: faixa do Simples Nacional pelo RBT12 e fração do
+      limite superior da faixa já usada (acima de 1 passou do limite do Simples)
+    - Situação: a já preenchida ou a da primeira regra que vale
+
+    Retorna: DataFrame com o mesmo índice de df
+    """
+    regras = REGRAS_SITUACAO if regras is None else regras
+    total = len(df)
+
+    colunas = {coluna: _numerico(df, coluna) for coluna in ("RBT12", "entrada", "saída", "imposto")}
+    meses = _meses(df["Período"]) if total else np.array([], dtype=float)
+    empresas = pd.factorize(df["Empresa"])[0] if total else np.array([], dtype=np.intp)
+
+    # Linhas com período válido, ordenadas por empresa e mês
+    # (uma chave inteira só: argsort é bem mais rápido que lexsort)
+    validas = np.flatnonzero(~np.isnan(meses) & (empresas >= 0))
+    base = int(np.nanmax(meses)) + MESES_JANELA + 1 if len(validas) else 1
+    chave = empresas[validas].astype(np.int64) * base + meses[validas].astype(np.int64)
+    posicoes = np.argsort(chave, kind="stable")
+    ordem, chave = validas[posicoes], chave[posicoes]
+
+    saida_12m = np.full(total, np.nan)
+    imposto_12m = np.full(total, np.nan)
+    meses_12m = np.zeros(total)
+    soma, quantidade = _soma_janela(chave, colunas["saída"][ordem], MESES_JANELA)
+    saida_12m[ordem] = np.where(quantidade > 0, soma, np.nan)
+    meses_12m[ordem] = quantidade
+    soma, quantidade = _soma_janela(chave, colunas["imposto"][ordem], MESES_JANELA)
+    imposto_12m[ordem] = np.where(quantidade > 0, soma, np.nan)
+
+    rbt12 = colunas["RBT12"]
+    indice_faixa = np.searchsorted(LIMITES_FAIXAS, np.nan_to_num(rbt12, nan=0.0), side="left")
+    limite = LIMITES_FAIXAS[np.minimum(indice_faixa, len(LIMITES_FAIXAS) - 1)]
+    sem_rbt12 = np.isnan(rbt12)
+    faixa = np.where(sem_rbt12 | (indice_faixa >= len(LIMITES_FAIXAS)), np.nan, indice_faixa + 1.0)
+
+    indicadores = {
+        "saída 12m": saida_12m,
+        "imposto 12m": imposto_12m,
+        "meses 12m": meses_12m,
+        "alíquota efetiva": _dividir(colunas["imposto"], colunas["saída"]),
+        "alíquota 12m": _dividir(imposto_12m, saida_12m),
+        "entrada/saída": _dividir(colunas["entrada"], colunas["saída"]),
+        "faixa": faixa,
+        "uso da faixa": np.where(sem_rbt12, np.nan, rbt12 / limite),
+    }
+
+    # Situação: a primeira regra verdadeira, sem sobrescrever o que já foi preenchido
+    # (em códigos inteiros, devolvida como categórica: sem montar textos por linha)
+    valores = {**colunas, **indicadores}
+    situacoes = list(dict.fromkeys([regra.situacao for regra in regras] + [SITUACAO_PADRAO]))
+    codigo_situacao = {situacao: codigo for codigo, situacao in enumerate(situacoes)}
+    codigos = np.full(total, codigo_situacao[SITUACAO_PADRAO])
+    for regra in reversed(regras):
+        codigos[regra.mascara(valores)] = codigo_situacao[regra.situacao]
+    if "Situação" in df:
+        codigos_existentes, existentes = pd.factorize(df["Situação"])
+        convertidos = np.full(len(existentes), -1)
+        for codigo, texto in enumerate(existentes):
+            if texto != "":
+                if texto not in codigo_situacao:
+                    codigo_situacao[texto] = len(situacoes)
+                    situacoes.append(texto)
+                convertidos[codigo] = codigo_situacao[texto]
+        preenchida = codigos_existentes >= 0
+        preenchida[preenchida] = convertidos[codigos_existentes[preenchida]] >= 0
+        codigos[preenchida] = convertidos[codigos_existentes[preenchida]]
+
+    resultado = pd.DataFrame(indicadores, index=df.index)
+    resultado["faixa"] = resultado["faixa"].astype("Int64")
+    resultado["meses 12m"] = resultado["meses 12m"].astype(int)
+    resultado["Situação"] = pd.Categorical.from_codes(codigos, categories=situacoes)
+    return resultado
+
+
+def evolucao_empresa(df, indicadores, empresa):
+    """
+    Linhas de uma empresa em ordem cronológica, com valores e indicadores
+    Retorna: DataFrame indexado pela data do período
+    """
+    linhas = (df["Empresa"] == empresa).to_numpy()
+    evolucao = pd.concat([df.loc[linhas, ["Período", "entrada", "saída", "imposto"]], indicadores.loc[linhas]], axis=1)
+    evolucao.index = pd.to_datetime(evolucao["Período"], format="%m/%Y", errors="coerce")
+    return evolucao.sort_index()
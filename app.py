@@ -1,12 +1,11 @@
 import streamlit as st
-import pdfplumber
-import pandas as pd
-import re
-import os
 from datetime import datetime
-import openpyxl
-from io import BytesIO
 import logging
+import time
+
+# Só módulos leves no topo: pandas, pdfplumber e openpyxl são importados nos
+# trechos que os usam, e a página vazia aparece sem esperar por eles
+from metricas import MetricasLote, ETAPAS, coletar
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -18,328 +17,242 @@ st.set_page_config(
     layout="wide"
 )
 
-@st.cache_data
-def limpar_valor_monetario(valor_str):
+# Segundos entre atualizações da página enquanto um lote é processado em segundo plano
+INTERVALO_TABELA_PARCIAL = 1.0
+
+@st.cache_resource
+def obter_cache_extracao():
     """
-    Converte valor monetário do formato brasileiro para numérico
-    Ex: "1.099,85" -> 1099.85
+    Cache de extração compartilhado entre reruns e sessões
     """
-    if not valor_str or valor_str == "Não encontrado":
-        return 0.0
-    
-    # Remove R$ e espaços
-    valor_limpo = valor_str.replace('R$', '').replace(' ', '').strip()
-    
-    # Remove pontos (separador de milhar) e substitui vírgula por ponto (decimal)
-    valor_limpo = valor_limpo.replace('.', '').replace(',', '.')
-    
-    try:
-        return float(valor_limpo)
-    except:
-        return 0.0
+    from cache_extracao import CacheExtracao
+    return CacheExtracao()
 
-def normalizar_cnpj(cnpj):
+@st.cache_data(max_entries=8, show_spinner="Gerando arquivo de exportação...")
+def exportar_em_cache(impressao, formato, com_indicadores, _df):
     """
-    Normaliza CNPJ removendo caracteres especiais e mantendo apenas números
+    Exportação cacheada pela impressão digital dos dados consolidados
     """
-    if not cnpj or cnpj == "Não encontrado" or pd.isna(cnpj):
-        return ""
-    return re.sub(r'[^\d]', '', str(cnpj))
+    from exportacao import gerar_exportacao
+    return gerar_exportacao(_df, formato)
 
-def normalizar_nome_empresa(nome):
+@st.cache_resource
+def obter_regras_situacao():
     """
-    Normaliza nome da empresa para comparação
+    Regras de preenchimento da Situação, lidas uma vez por processo
     """
-    if not nome:
-        return ""
-    return nome.upper().strip()
+    from analise import regras_em_vigor
+    return regras_em_vigor()
 
-def consolidar_dados_empresa(dados_originais):
+@st.cache_resource(max_entries=4)
+def obter_indicadores(impressao, _df):
     """
-    Consolida dados de ENTRADAS e PGDAS da mesma empresa e período
-    Usa lógica melhorada baseada em agrupamento por empresa + período
+    Indicadores e Situação, calculados uma vez por versão dos dados
     """
-    # Converter para DataFrame para facilitar o agrupamento
-    df = pd.DataFrame(dados_originais)
-    
-    # Normalizar nome da empresa (remove espaços extras, maiúsculas/minúsculas)
-    df["Empresa_norm"] = df["Empresa"].str.strip().str.upper()
-    
-    # Criar chave de agrupamento apenas com Empresa + Período
-    # Usar período de acordo com o tipo de documento
-    df["periodo_consolidado"] = df.apply(lambda row: 
-        row.get('Período', '') if row.get('Tipo_Documento') == 'ENTRADAS' 
-        else row.get('Período de Apuração', ''), axis=1)
-    
-    df["chave"] = df["Empresa_norm"] + "_" + df["periodo_consolidado"]
-    
-    # Mapear campos originais para os novos nomes
-    # Criar colunas com os novos nomes baseados nos campos originais
-    # Verificar se as colunas existem antes de acessá-las
-    df["entrada"] = df.get("Total de Entradas", None)
-    df["saída"] = df.get("Receita Bruta Informada", None)
-    df["imposto"] = df.get("Total do Débito Declarado", None)
-    
-    # Converter campos numéricos para float, tratando valores não numéricos
-    def converter_para_float(serie):
-        """Converte série para float, tratando valores não numéricos"""
-        resultado = []
-        for valor in serie:
-            if pd.isna(valor) or valor == "Não encontrado" or valor is None:
-                resultado.append(None)
-            else:
-                try:
-                    # Se já é numérico, mantém
-                    if isinstance(valor, (int, float)):
-                        resultado.append(float(valor))
-                    else:
-                        # Se é string, tenta converter
-                        resultado.append(limpar_valor_monetario(str(valor)))
-                except:
-                    resultado.append(None)
-        return pd.Series(resultado)
-    
-    # Aplicar conversão para campos numéricos
-    df["entrada"] = converter_para_float(df["entrada"])
-    df["saída"] = converter_para_float(df["saída"])
-    df["imposto"] = converter_para_float(df["imposto"])
-    df["RBT12"] = converter_para_float(df.get("RBT12", None))
-    
-    # Consolida somando os valores numéricos
-    df_final = df.groupby(["chave", "Empresa_norm", "periodo_consolidado"], as_index=False).agg({
-        "CNPJ": lambda x: ', '.join(x.dropna().unique()) if x.dropna().any() else None,  # mantém todos CNPJs encontrados
-        "entrada": lambda x: x.sum() if x.notna().any() else None,
-        "RBT12": lambda x: x.sum() if x.notna().any() else None,
-        "saída": lambda x: x.sum() if x.notna().any() else None,
-        "imposto": lambda x: x.sum() if x.notna().any() else None
-    })
-    
-    # Renomear colunas para o formato final
-    df_final = df_final.rename(columns={
-        "Empresa_norm": "Empresa",
-        "periodo_consolidado": "Período"
-    })
-    
-    # Remover a coluna "chave" antes de retornar
-    df_final = df_final.drop(columns=["chave"])
-    
-    # Adicionar coluna Situação vazia
-    df_final["Situação"] = ""
-    
-    # Definir ordem das colunas
-    ordem_colunas = [
-        "Empresa",
-        "CNPJ", 
-        "Período",
-        "RBT12",
-        "entrada",
-        "saída",
-        "imposto",
-        "Situação"
-    ]
-    
-    # Reordenar colunas
-    df_final = df_final[ordem_colunas]
-    
-    # Converter de volta para lista de dicionários
-    dados_consolidados = df_final.to_dict('records')
-    
-    # Ordenar por empresa e período
-    dados_consolidados.sort(key=lambda x: (x['Empresa'], x['Período']))
-    
-    return dados_consolidados
+    from analise import calcular_indicadores
+    return calcular_indicadores(_df, obter_regras_situacao())
 
-def detectar_tipo_documento(pdf_file):
+@st.cache_resource(max_entries=4)
+def obter_indice_consulta(impressao, _df):
     """
-    Detecta automaticamente o tipo de documento baseado no conteúdo do PDF
-    Retorna: 'ENTRADAS', 'PGDAS' ou 'DESCONHECIDO'
+    Índices de busca e ordenação, montados uma vez por versão dos dados
     """
-    try:
-        with pdfplumber.open(pdf_file) as pdf:
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text() + "\n"
-        
-        # Palavras-chave para identificar ENTRADAS
-        palavras_entradas = [
-            "Total de Entradas",
-            "Relatório de Entradas",
-            "Entradas do Período"
-        ]
-        
-        # Palavras-chave para identificar PGDAS
-        palavras_pgdas = [
-            "PGDAS",
-            "Programa Gerador do DAS",
-            "Período de Apuração (PA)",
-            "Receita bruta acumulada nos doze meses anteriores ao PA",
-            "Receita Bruta do PA (RPA) - Competência",
-            "Total Geral da Empresa",
-            "IRPJ",
-            "CSLL",
-            "COFINS",
-            "PIS/Pasep",
-            "INSS/CPP",
-            "ICMS",
-            "IPI"
-        ]
-        
-        # Contar ocorrências de palavras-chave
-        contador_entradas = sum(1 for palavra in palavras_entradas if palavra.lower() in text.lower())
-        contador_pgdas = sum(1 for palavra in palavras_pgdas if palavra.lower() in text.lower())
-        
-        # Determinar tipo baseado no maior número de ocorrências
-        if contador_entradas > contador_pgdas and contador_entradas > 0:
-            return "ENTRADAS"
-        elif contador_pgdas > contador_entradas and contador_pgdas > 0:
-            return "PGDAS"
-        else:
-            # Se não conseguir detectar claramente, tentar padrões mais específicos
-            if "Total de Entradas:" in text:
-                return "ENTRADAS"
-            elif "PGDAS" in text or "Programa Gerador do DAS" in text:
-                return "PGDAS"
-            else:
-                return "DESCONHECIDO"
-                
-    except Exception as e:
-        st.error(f"Erro ao detectar tipo do documento: {str(e)}")
-        return "DESCONHECIDO"
+    from consulta import IndiceConsulta
+    return IndiceConsulta(_df)
 
-def extrair_dados_entradas(pdf_file):
+@st.cache_resource
+def obter_armazenamento():
     """
-    Extrai dados do PDF de relatórios de entradas
+    Banco local com os registros de todas as sessões
     """
-    data = {
-        "Empresa": None,
-        "CNPJ": None,
-        "Período": None,
-        "Total de Entradas": None,
-        "Tipo_Documento": "ENTRADAS"
-    }
+    from armazenamento import ArmazenamentoDados
+    return ArmazenamentoDados()
 
-    with pdfplumber.open(pdf_file) as pdf:
-        text = ""
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
+@st.cache_resource(show_spinner=False)
+def preaquecer_extracao():
+    """
+    Com EXTRACAO_PREAQUECER ativo, sobe os processos de extração em segundo
+    plano uma vez por servidor, enquanto o usuário ainda escolhe os arquivos
+    """
+    from processamento import PREAQUECER, preaquecer
+    if PREAQUECER:
+        preaquecer()
 
-    # Extrair nome da empresa
-    empresa_match = re.search(r"([A-Z\s&]+LTDA)", text)
-    if empresa_match:
-        data["Empresa"] = empresa_match.group(1).strip()
+def tabela_consolidada(origem, versao, carregar):
+    """
+    DataFrame consolidado, com a Situação preenchida pelas regras, e sua
+    impressão digital, refeitos só quando os dados mudam: reruns de uma
+    tecla digitada na busca não percorrem a tabela de novo
+    origem: tarefa ou banco de onde vêm os dados
+    versao: versão dos dados na origem, lida antes de `carregar`
+    carregar: função que retorna os dados consolidados
+    Retorna: (DataFrame, impressão digital), ou (None, None) sem dados
+    """
+    tabela = st.session_state.get("tabela_consolidada")
+    if tabela is not None and tabela[0] is origem and tabela[1] == versao:
+        return tabela[2], tabela[3]
+    
+    df, impressao = None, None
+    dados_consolidados = carregar()
+    if dados_consolidados:
+        import pandas as pd
+        from exportacao import impressao_digital
+        df = pd.DataFrame(dados_consolidados)
+        impressao = impressao_digital(df)
+        df["Situação"] = obter_indicadores(impressao, df)["Situação"]
+    st.session_state["tabela_consolidada"] = (origem, versao, df, impressao)
+    return df, impressao
 
-    # Extrair CNPJ
-    cnpj_match = re.search(r"CNPJ:\s*([\d./-]+)", text)
-    if cnpj_match:
-        data["CNPJ"] = cnpj_match.group(1).strip()
+def registros_da_empresa(armazenamento, tarefa, empresa, incluir_historico):
+    """
+    Registros originais de ENTRADAS e PGDAS de uma empresa da tabela
+    Retorna: (entradas, pgdas)
+    """
+    if incluir_historico:
+        try:
+            registros = armazenamento.registros(empresa=empresa)
+        except Exception as e:
+            logger.error(f"Erro ao consultar registros de {empresa}: {str(e)}")
+            registros = []
+        entradas = [dado for dado in registros if dado.get("Tipo_Documento") == "ENTRADAS"]
+        pgdas = [dado for dado in registros if dado.get("Tipo_Documento") != "ENTRADAS"]
+        return entradas, pgdas
 
-    # Extrair período e simplificar para MM/AAAA
-    periodo_match = re.search(r"Período:\s*([\d/]+ até [\d/]+)", text)
-    if periodo_match:
-        periodo_completo = periodo_match.group(1).strip()
-        # Extrair apenas o mês e ano do período
-        mes_ano_match = re.search(r"(\d{2})/(\d{4})", periodo_completo)
-        if mes_ano_match:
-            data["Período"] = f"{mes_ano_match.group(1)}/{mes_ano_match.group(2)}"
+    if tarefa is None:
+        return [], []
+    return tarefa.registros_da_empresa(empresa)
 
-    # Extrair apenas o total de entradas
-    entradas_match = re.search(r"Total de Entradas:\s*([\d.,]+)", text)
-    if entradas_match:
-        data["Total de Entradas"] = float(entradas_match.group(1).replace(".", "").replace(",", "."))
+def exibir_diagnostico(lote):
+    """
+    Painel com o tempo de cada etapa e de cada arquivo do último lote extraído
+    """
+    import pandas as pd
+    
+    st.markdown("### 🩺 Diagnóstico de Desempenho")
+    if not lote.arquivos:
+        st.info("Nenhum arquivo processado nesta sessão.")
+        return
+    
+    totais = lote.totais_etapas()
+    contadores = lote.totais_contadores()
+    tempo_total = sum(totais.values())
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("📄 Arquivos extraídos", f"{lote.extraidos} de {len(lote.arquivos)}")
+    with col2:
+        st.metric("⏱️ Tempo total", f"{tempo_total:.2f}s")
+    with col3:
+        st.metric("📑 Páginas lidas", f"{contadores.get('paginas_lidas', 0)} de {contadores.get('paginas', 0)}")
+    with col4:
+        st.metric("💾 Volume", f"{contadores.get('bytes', 0) / (1024 * 1024):.1f} MB")
+    
+    st.dataframe(pd.DataFrame({
+        "Etapa": list(totais),
+        "Tempo (s)": list(totais.values()),
+        "% do total": [100 * duracao / tempo_total if tempo_total else 0.0 for duracao in totais.values()],
+    }), use_container_width=True, hide_index=True)
+    
+    st.dataframe(pd.DataFrame([
+        {
+            "Arquivo": arquivo["nome"],
+            "Tipo": arquivo["tipo"],
+            "Origem": f"cópia de {arquivo['duplicata']}" if arquivo.get("duplicata") else "cache" if arquivo["cache"] else "extração",
+            "Duração (s)": arquivo["duracao"],
+            "Páginas": arquivo["contadores"].get("paginas"),
+            "Páginas lidas": arquivo["contadores"].get("paginas_lidas"),
+            "Bytes": arquivo["contadores"].get("bytes"),
+            **{etapa: arquivo["etapas"].get(etapa) for etapa in ETAPAS[:5]},
+            "Erro": arquivo["erro"],
+        }
+        for arquivo in lote.arquivos
+    ]), use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("📥 Métricas JSON", lote.para_json(), file_name="metricas_extracao.json", mime="application/json")
+    with col2:
+        st.download_button("📥 Métricas Prometheus", lote.para_prometheus(), file_name="metricas_extracao.prom", mime="text/plain")
 
-    return data
+def obter_tarefa(uploaded_files, armazenamento):
+    """
+    Tarefa de extração dos arquivos enviados, guardada na sessão
+    Um novo conjunto de arquivos cancela a tarefa anterior e inicia outra;
+    reruns com os mesmos arquivos apenas consultam a tarefa em andamento
+    """
+    chave = tuple(uploaded_file.file_id for uploaded_file in uploaded_files or [])
+    tarefa = st.session_state.get("tarefa")
+    if tarefa is not None and st.session_state.get("tarefa_arquivos") == chave:
+        return tarefa
+    
+    if tarefa is not None:
+        tarefa.cancelar()
+    if not uploaded_files:
+        st.session_state.pop("tarefa", None)
+        st.session_state.pop("tarefa_arquivos", None)
+        return None
+    
+    from tarefas import TarefaExtracao
+    
+    # Conteúdo lido direto da memória, sem arquivos temporários
+    arquivos = [(uploaded_file.name, uploaded_file.getbuffer()) for uploaded_file in uploaded_files]
+    tarefa = TarefaExtracao(arquivos, cache=obter_cache_extracao(), armazenamento=armazenamento).iniciar()
+    st.session_state["tarefa"] = tarefa
+    st.session_state["tarefa_arquivos"] = chave
+    return tarefa
 
-def extrair_dados_pgdas(pdf_path):
+def exibir_progresso(tarefa):
     """
-    Extrai dados do PDF do PGDAS
+    Progresso da tarefa em segundo plano, com opção de cancelar ou retomar
+    Retorna True quando a tarefa deve ser reiniciada
     """
-    dados_por_arquivo = {
-        'CNPJ': None,
-        'Empresa': "Não encontrado",
-        'Período de Apuração': "Não encontrado",
-        'RBT12': "Não encontrado",
-        'Receita Bruta Informada': "Não encontrado",
-        'Total do Débito Declarado': "Não encontrado",
-        'Tipo_Documento': "PGDAS"
-    }
+    from tarefas import CANCELADA, FALHOU
     
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for pagina_num, pagina in enumerate(pdf.pages, 1):
-                texto = pagina.extract_text()
-                if texto:
-                    lines = texto.split('\n')
-                    
-                    # Buscar RBT12
-                    if dados_por_arquivo['RBT12'] == "Não encontrado":
-                        for i, line in enumerate(lines):
-                            if 'Receita bruta acumulada nos doze meses anteriores ao PA' in line and i + 1 < len(lines):
-                                next_line = lines[i + 1].strip()
-                                valor_match = re.search(r'([\d.,]+)', next_line)
-                                if valor_match:
-                                    dados_por_arquivo['RBT12'] = valor_match.group(1)
-                                    break
-                    
-                    # Buscar Período de Apuração
-                    if dados_por_arquivo['Período de Apuração'] == "Não encontrado":
-                        pa_match = re.search(r'Período de Apuração \(PA\)[:\s]*(\d{2}/\d{4})', texto, re.IGNORECASE | re.MULTILINE)
-                        if pa_match:
-                            dados_por_arquivo['Período de Apuração'] = pa_match.group(1)
-                    
-                    # Buscar Receita Bruta Informada
-                    if dados_por_arquivo['Receita Bruta Informada'] == "Não encontrado":
-                        for line in lines:
-                            if 'Receita Bruta do PA (RPA) - Competência' in line:
-                                valor_match = re.search(r'([\d.,]+)', line)
-                                if valor_match:
-                                    dados_por_arquivo['Receita Bruta Informada'] = valor_match.group(1)
-                                    break
-                    
-                    # Buscar nome da empresa
-                    if dados_por_arquivo['Empresa'] == "Não encontrado":
-                        nome_match = re.search(r'Nome Empresarial[:\s]*([^,\n]+)', texto, re.IGNORECASE)
-                        if nome_match:
-                            dados_por_arquivo['Empresa'] = nome_match.group(1).strip()
-                    
-                    # Buscar Total do Débito Declarado
-                    if dados_por_arquivo['Total do Débito Declarado'] == "Não encontrado":
-                        for i, line in enumerate(lines):
-                            if 'Total Geral da Empresa' in line:
-                                for j in range(i+1, min(i+5, len(lines))):
-                                    current_line = lines[j]
-                                    if 'IRPJ' in current_line and 'CSLL' in current_line and 'COFINS' in current_line and 'Total' in current_line:
-                                        if j + 1 < len(lines):
-                                            valores_line = lines[j + 1]
-                                            valores_match = re.findall(r'([\d.,]+)', valores_line)
-                                            if valores_match:
-                                                dados_por_arquivo['Total do Débito Declarado'] = valores_match[-1]
-                                                break
-                                break
-                        
-                        if dados_por_arquivo['Total do Débito Declarado'] == "Não encontrado":
-                            for i, line in enumerate(lines):
-                                valores_match = re.findall(r'([\d.,]+)', line)
-                                if len(valores_match) >= 8:
-                                    if i > 0 and 'IRPJ' in lines[i-1] and 'CSLL' in lines[i-1] and 'COFINS' in lines[i-1]:
-                                        dados_por_arquivo['Total do Débito Declarado'] = valores_match[-1]
-                                        break
-                        
-                        if dados_por_arquivo['Total do Débito Declarado'] == "Não encontrado":
-                            for i, line in enumerate(lines):
-                                if 'Total do Débito Declarado' in line and '(exigível + suspenso)' in line:
-                                    for j in range(i+1, min(i+4, len(lines))):
-                                        valores_line = lines[j]
-                                        valores_match = re.findall(r'([\d.,]+)', valores_line)
-                                        if len(valores_match) >= 8:
-                                            dados_por_arquivo['Total do Débito Declarado'] = valores_match[-1]
-                                            break
-                                    break
+    processados, total = tarefa.progresso()
     
-    except Exception as e:
-        st.error(f"Erro ao processar o PDF: {str(e)}")
-        return []
+    for nivel, mensagem in tarefa.mensagens():
+        if nivel == "aviso":
+            st.warning(mensagem)
+        else:
+            st.error(mensagem)
     
-    return [dados_por_arquivo] if any(valor != "Não encontrado" for valor in dados_por_arquivo.values()) else []
+    if tarefa.em_execucao:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.progress(processados / total, text=f"⏳ Processando em segundo plano: {processados} de {total} arquivos. A tabela abaixo já pode ser consultada.")
+        with col2:
+            if st.button("⏹️ Cancelar processamento"):
+                tarefa.cancelar()
+                st.toast("Cancelamento solicitado; os arquivos já processados continuam disponíveis.")
+        return False
+    
+    if tarefa.estado == CANCELADA:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.info(f"⏹️ Processamento cancelado: {processados} de {total} arquivos processados.")
+        with col2:
+            # Arquivos já processados vêm do cache de extração
+            return st.button("▶️ Retomar processamento")
+    
+    if tarefa.estado == FALHOU:
+        st.error(f"Processamento interrompido após {processados} de {total} arquivos.")
+    
+    # Mostrar resumo da detecção
+    st.markdown("### 📊 Resumo da Detecção Automática")
+    col1, col2, col3 = st.columns(3)
+    
+    tipos_detectados = tarefa.tipos_detectados()
+    entradas_count = sum(1 for tipo in tipos_detectados.values() if tipo == "ENTRADAS")
+    pgdas_count = sum(1 for tipo in tipos_detectados.values() if tipo == "PGDAS")
+    desconhecidos_count = sum(1 for tipo in tipos_detectados.values() if tipo == "DESCONHECIDO")
+    
+    with col1:
+        st.metric("📊 Relatórios de Entradas", entradas_count)
+    with col2:
+        st.metric("📋 Documentos PGDAS", pgdas_count)
+    with col3:
+        st.metric("❓ Não Identificados", desconhecidos_count)
+    return False
 
 def main():
     st.title("Extração de Dados Fiscais")
@@ -358,180 +271,173 @@ def main():
         help="Você pode misturar arquivos de Entradas e PGDAS. O sistema reconhecerá cada um automaticamente."
     )
     
-    if uploaded_files:
-        # Processar arquivos com detecção automática
-        with st.spinner("Processando arquivos e detectando tipos automaticamente..."):
-            todos_dados = []
-            dados_por_empresa = {}
-            tipos_detectados = {}
-            
-            # Barra de progresso
-            progress_bar = st.progress(0)
-            total_files = len(uploaded_files)
-            
-            for i, uploaded_file in enumerate(uploaded_files):
-                # Atualizar barra de progresso
-                progress_bar.progress((i + 1) / total_files)
-                
-                try:
-                    # Salvar arquivo temporariamente
-                    temp_path = f"temp_{uploaded_file.name}"
-                    with open(temp_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                    
-                    # Detectar tipo do documento automaticamente
-                    tipo_detectado = detectar_tipo_documento(temp_path)
-                    tipos_detectados[uploaded_file.name] = tipo_detectado
-                    
-                    # Fallback para PGDAS se não identificado
-                    if tipo_detectado == "DESCONHECIDO":
-                        tipo_detectado = "PGDAS"
-                    
-                    # Processar baseado no tipo detectado
-                    if tipo_detectado == "ENTRADAS":
-                        dados = extrair_dados_entradas(temp_path)
-                        if dados and dados["Empresa"]:
-                            todos_dados.append(dados)
-                            
-                            # Agrupar por empresa
-                            empresa = dados["Empresa"]
-                            if empresa not in dados_por_empresa:
-                                dados_por_empresa[empresa] = {
-                                    'dados_empresa': {
-                                        'CNPJ': dados.get('CNPJ', 'Não encontrado'),
-                                        'Nome_Empresa': empresa
-                                    },
-                                    'entradas': [],
-                                    'pgdas': []
-                                }
-                            dados_por_empresa[empresa]['entradas'].append(dados)
-                    
-                    elif tipo_detectado == "PGDAS":
-                        dados = extrair_dados_pgdas(temp_path)
-                        for dado in dados:
-                            if dado and dado["Empresa"]:
-                                todos_dados.append(dado)
-                                
-                                # Agrupar por empresa
-                                empresa = dado["Empresa"]
-                                if empresa not in dados_por_empresa:
-                                    dados_por_empresa[empresa] = {
-                                        'dados_empresa': {
-                                            'CNPJ': dado.get('CNPJ', 'Não encontrado'),
-                                            'Nome_Empresa': empresa
-                                        },
-                                        'entradas': [],
-                                        'pgdas': []
-                                    }
-                                dados_por_empresa[empresa]['pgdas'].append(dado)
-                    
-                except Exception as e:
-                    st.error(f"Erro ao processar arquivo {uploaded_file.name}: {str(e)}")
-                    logger.error(f"Erro ao processar {uploaded_file.name}: {str(e)}")
-                
-                finally:
-                    # Limpar arquivo temporário
-                    if os.path.exists(temp_path):
-                        try:
-                            os.remove(temp_path)
-                        except:
-                            pass
-            
-            # Limpar barra de progresso
-            progress_bar.empty()
-            
-            # Mostrar resumo da detecção
-            st.markdown("### 📊 Resumo da Detecção Automática")
-            col1, col2, col3 = st.columns(3)
-            
-            entradas_count = sum(1 for tipo in tipos_detectados.values() if tipo == "ENTRADAS")
-            pgdas_count = sum(1 for tipo in tipos_detectados.values() if tipo == "PGDAS")
-            desconhecidos_count = sum(1 for tipo in tipos_detectados.values() if tipo == "DESCONHECIDO")
-            
-            with col1:
-                st.metric("📊 Relatórios de Entradas", entradas_count)
-            with col2:
-                st.metric("📋 Documentos PGDAS", pgdas_count)
-            with col3:
-                st.metric("❓ Não Identificados", desconhecidos_count)
-            
-        if todos_dados:
-            st.markdown("### 📊 Dados Extraídos")
-            
-            # Consolidar dados da mesma empresa e período
-            dados_consolidados = consolidar_dados_empresa(todos_dados)
-            
-            # Criar DataFrame unificado
-            df_unificado = pd.DataFrame(dados_consolidados)
-            
-            # Mostrar informações sobre consolidação
-            st.info(f"🔄 **Consolidação Automática**: {len(todos_dados)} registros originais foram consolidados em {len(dados_consolidados)} registros únicos por empresa/período")
-            
-            # Filtros
-            col1, col2, col3 = st.columns([2, 1, 1])
-            
-            with col1:
-                busca_empresa = st.text_input("🔍 Buscar empresa:", placeholder="Digite o nome da empresa...")
-            
-            with col2:
-                filtro_dados = st.selectbox("📄 Dados:", ["Todos", "Com Entradas", "Com PGDAS", "Completos"])
-            
-            with col3:
-                ordenacao = st.selectbox("📊 Ordenar por:", ["Empresa", "Período", "Entrada", "Imposto"])
-            
-            # Aplicar filtros
-            df_filtrado = df_unificado.copy()
-            
-            if busca_empresa:
-                df_filtrado = df_filtrado[df_filtrado['Empresa'].str.contains(busca_empresa, case=False, na=False)]
-            
-            # Filtro por tipo de dados
-            if filtro_dados == "Com Entradas":
-                df_filtrado = df_filtrado[df_filtrado['entrada'].notna()]
-            elif filtro_dados == "Com PGDAS":
-                df_filtrado = df_filtrado[df_filtrado['RBT12'].notna()]
-            elif filtro_dados == "Completos":
-                df_filtrado = df_filtrado[
-                    (df_filtrado['entrada'].notna()) & 
-                    (df_filtrado['RBT12'].notna())
-                ]
-            
-            # Ordenação
-            if ordenacao == "Empresa":
-                df_filtrado = df_filtrado.sort_values('Empresa')
-            elif ordenacao == "Período":
-                df_filtrado = df_filtrado.sort_values('Período')
-            elif ordenacao == "Entrada":
-                df_filtrado = df_filtrado.sort_values('entrada', ascending=False, na_last=True)
-            elif ordenacao == "Imposto":
-                df_filtrado = df_filtrado.sort_values('imposto', ascending=False, na_last=True)
-            
-            # Exibir tabela
-            st.dataframe(df_filtrado, use_container_width=True)
-            
-            # Estatísticas
-            st.info(f"📈 Exibindo {len(df_filtrado)} de {len(df_unificado)} registros")
-            
-            
-            # Download Excel
-            st.markdown("### 📥 Exportação")
-            
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                # Planilha principal
-                df_unificado.to_excel(writer, sheet_name='Dados Consolidados', index=False)
-            
-            output.seek(0)
-            
-            st.download_button(
-                label="📥 Download Excel Completo",
-                data=output.getvalue(),
-                file_name=f"Dados_Consolidados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+    incluir_historico = st.checkbox(
+        "📦 Incluir dados armazenados de sessões anteriores",
+        help="Exibe a consolidação de todos os arquivos já processados, não apenas dos enviados agora."
+    )
+    
+    # O banco só é aberto quando há arquivos ou histórico a consultar
+    armazenamento = obter_armazenamento() if uploaded_files or incluir_historico else None
+    
+    # Extração em segundo plano: a página continua respondendo durante o lote
+    tarefa = obter_tarefa(uploaded_files, armazenamento)
+    if tarefa is not None and exibir_progresso(tarefa):
+        # Retomada: nova tarefa com os mesmos arquivos
+        st.session_state.pop("tarefa_arquivos", None)
+        obter_tarefa(uploaded_files, armazenamento)
+        st.rerun()
+    
+    # Reruns servidos pelo cache não substituem as métricas da última extração real
+    if tarefa is not None and not tarefa.em_execucao and tarefa.lote.extraidos:
+        st.session_state["diagnostico"] = tarefa.lote
+    diagnostico = st.session_state.get("diagnostico", MetricasLote())
+    
+    if incluir_historico:
+        df_unificado, impressao = tabela_consolidada(
+            armazenamento, armazenamento.versao_dados(), armazenamento.dados_consolidados
+        )
+    elif tarefa is not None:
+        # Consolidação acumulada registro a registro conforme os arquivos terminam
+        df_unificado, impressao = tabela_consolidada(tarefa, tarefa.versao, tarefa.dados_consolidados)
+    else:
+        df_unificado, impressao = None, None
+    
+    if df_unificado is not None:
+        import pandas as pd
+        from exportacao import FORMATOS
+        from consulta import FILTROS_DADOS, ORDENACOES, TAMANHOS_PAGINA, TODAS_SITUACOES, total_paginas
+        from analise import evolucao_empresa, COLUNAS_INDICADORES
+        
+        st.markdown("### 📊 Dados Extraídos")
+        
+        indicadores = obter_indicadores(impressao, df_unificado)
         
+        # Mostrar informações sobre consolidação
+        if incluir_historico:
+            st.info(f"📦 **Dados Armazenados**: {len(df_unificado)} registros únicos por empresa/período de todas as sessões")
         else:
-            st.warning("Nenhum dado foi encontrado nos PDFs. Verifique se os arquivos contêm as informações esperadas.")
+            st.info(f"🔄 **Consolidação Automática**: {tarefa.registros} registros originais foram consolidados em {len(df_unificado)} registros únicos por empresa/período")
+        
+        # Filtros
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+        
+        with col1:
+            busca_empresa = st.text_input("🔍 Buscar empresa:", placeholder="Digite o nome da empresa ou o CNPJ...")
+        
+        with col2:
+            filtro_dados = st.selectbox("📄 Dados:", FILTROS_DADOS)
+        
+        with col3:
+            ordenacao = st.selectbox("📊 Ordenar por:", ORDENACOES)
+        
+        # Aplicar filtros e ordenação sobre os índices pré-calculados
+        indice = obter_indice_consulta(impressao, df_unificado)
+        
+        with col4:
+            situacao = st.selectbox("🏷️ Situação:", [TODAS_SITUACOES] + sorted(indice.situacoes))
+        
+        posicoes = indice.selecionar(busca_empresa, filtro_dados, ordenacao, situacao)
+        
+        # Paginação no servidor: só a página visível é enviada ao navegador
+        col1, col2, col3 = st.columns([1, 1, 2])
+        
+        with col1:
+            tamanho_pagina = st.selectbox("📑 Linhas por página:", TAMANHOS_PAGINA, index=1)
+        
+        paginas = total_paginas(len(posicoes), tamanho_pagina)
+        # Filtros novos podem reduzir o número de páginas
+        if st.session_state.get("pagina_tabela", 1) > paginas:
+            st.session_state["pagina_tabela"] = paginas
+        
+        with col2:
+            pagina = st.number_input(f"📄 Página (de {paginas}):", min_value=1, max_value=paginas, step=1, key="pagina_tabela")
+        
+        with col3:
+            st.write("")
+            exibir_indicadores = st.checkbox("📈 Exibir indicadores", help="Receita e imposto em 12 meses, alíquota efetiva, entrada/saída e faixa do Simples Nacional pelo RBT12")
+        
+        df_pagina = indice.pagina(posicoes, pagina, tamanho_pagina)
+        if exibir_indicadores:
+            # O índice da página é a posição da linha na tabela completa
+            df_pagina = df_pagina.join(indicadores[COLUNAS_INDICADORES])
+        
+        # Exibir tabela
+        st.dataframe(df_pagina, use_container_width=True)
+        
+        # Estatísticas
+        if len(posicoes):
+            inicio = (pagina - 1) * tamanho_pagina
+            st.info(f"📈 Exibindo {inicio + 1}–{inicio + len(df_pagina)} de {len(posicoes)} registros filtrados ({len(df_unificado)} no total)")
+        else:
+            st.info(f"📈 Exibindo 0 de {len(df_unificado)} registros")
+        
+        # Detalhamento dos registros originais de uma empresa da página
+        empresas_pagina = list(dict.fromkeys(df_pagina["Empresa"]))
+        empresa_detalhe = st.selectbox(
+            "🔎 Detalhar empresa:",
+            [""] + empresas_pagina,
+            format_func=lambda empresa: empresa or "Selecione uma empresa da página..."
+        )
+        if empresa_detalhe:
+            entradas, pgdas = registros_da_empresa(armazenamento, tarefa, empresa_detalhe, incluir_historico)
+            with st.expander(f"📂 Registros originais de {empresa_detalhe}", expanded=True):
+                evolucao = evolucao_empresa(df_unificado, indicadores, empresa_detalhe)
+                if len(evolucao) > 1:
+                    st.markdown("**Evolução**: saída e imposto acumulados em 12 meses")
+                    st.line_chart(evolucao[["saída 12m", "imposto 12m"]])
+                st.dataframe(evolucao, use_container_width=True, hide_index=True)
+                st.markdown(f"**Entradas** ({len(entradas)})")
+                if entradas:
+                    st.dataframe(pd.DataFrame(entradas), use_container_width=True)
+                st.markdown(f"**PGDAS** ({len(pgdas)})")
+                if pgdas:
+                    st.dataframe(pd.DataFrame(pgdas), use_container_width=True)
+        
+        
+        # Exportação gerada apenas quando solicitada
+        st.markdown("### 📥 Exportação")
+        
+        col1, col2, col3 = st.columns([1, 1, 2])
+        
+        with col1:
+            formato = st.selectbox("📄 Formato:", list(FORMATOS), format_func=str.upper)
+        
+        with col2:
+            st.write("")
+            com_indicadores = st.checkbox("📈 Incluir indicadores")
+        
+        with col3:
+            st.write("")
+            if st.button("⚙️ Preparar arquivo"):
+                st.session_state["exportacao_pedida"] = (impressao, formato, com_indicadores)
+        
+        # Pedido só vale enquanto os dados e as opções forem os mesmos
+        if st.session_state.get("exportacao_pedida") == (impressao, formato, com_indicadores):
+            extensao, mime = FORMATOS[formato]
+            df_exportacao = df_unificado.join(indicadores[COLUNAS_INDICADORES]) if com_indicadores else df_unificado
+            with coletar(diagnostico.coletor):
+                exportacao = exportar_em_cache(impressao, formato, com_indicadores, df_exportacao)
+            st.download_button(
+                label=f"📥 Download {formato.upper()} Completo",
+                data=exportacao,
+                file_name=f"Dados_Consolidados_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extensao}",
+                mime=mime
+            )
+    
+    elif tarefa is not None and not tarefa.em_execucao:
+        st.warning("Nenhum dado foi encontrado nos PDFs. Verifique se os arquivos contêm as informações esperadas.")
+    
+    if st.checkbox("🩺 Mostrar diagnóstico de desempenho"):
+        exibir_diagnostico(diagnostico)
+    
+    # Depois da página montada, para não atrasar a primeira exibição
+    preaquecer_extracao()
+    
+    # Enquanto o lote roda, a página é atualizada periodicamente; interações
+    # do usuário disparam um rerun imediato e não reiniciam o processamento
+    if tarefa is not None and tarefa.em_execucao:
+        time.sleep(INTERVALO_TABELA_PARCIAL)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
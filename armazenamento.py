@@ -0,0 +1,253 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from extracao import versao_extrator
+from consolidacao import ConsolidacaoIncremental, chave_consolidacao, chave_documento, normalizar_cnpj
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_BANCO = os.environ.get(
+    "DADOS_DB",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "app-dados-empresas", "dados_fiscais.sqlite3")
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivos (
+    hash TEXT PRIMARY KEY,
+    nome TEXT NOT NULL,
+    tipo_detectado TEXT,
+    versao_extrator TEXT NOT NULL,
+    processado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_arquivos_nome ON arquivos (nome);
+
+CREATE TABLE IF NOT EXISTS registros (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL REFERENCES arquivos (hash) ON DELETE CASCADE,
+    tipo_documento TEXT,
+    empresa_norm TEXT,
+    periodo TEXT,
+    cnpj_norm TEXT,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_registros_hash ON registros (hash);
+CREATE INDEX IF NOT EXISTS idx_registros_chave ON registros (empresa_norm, periodo);
+CREATE INDEX IF NOT EXISTS idx_registros_cnpj ON registros (cnpj_norm);
+
+CREATE TABLE IF NOT EXISTS consolidados (
+    empresa TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    cnpj TEXT,
+    rbt12 REAL,
+    entrada REAL,
+    saida REAL,
+    imposto REAL,
+    situacao TEXT,
+    PRIMARY KEY (empresa, periodo)
+);
+"""
+
+# Coluna da tabela consolidados -> chave do registro consolidado
+COLUNAS_CONSOLIDADOS = {
+    "empresa": "Empresa",
+    "cnpj": "CNPJ",
+    "periodo": "Período",
+    "rbt12": "RBT12",
+    "entrada": "entrada",
+    "saida": "saída",
+    "imposto": "imposto",
+    "situacao": "Situação",
+}
+
+
+class ArmazenamentoDados:
+    """
+    Banco SQLite local com os registros extraídos e a consolidação por
+    empresa e período. Arquivos são identificados pelo hash do conteúdo, de
+    modo que reenviar um arquivo já conhecido não gera nova ingestão; um
+    arquivo novo com o mesmo documento (tipo, CNPJ ou empresa e período) de
+    outro já gravado é tratado como nova versão dele e substitui seus registros
+    """
+
+    def __init__(self, caminho=CAMINHO_BANCO):
+        self.caminho = caminho
+        # Banco em memória só existe enquanto a conexão estiver aberta: uma
+        # única conexão, compartilhada entre threads sob um lock
+        self._conexao_memoria = None
+        if caminho == ":memory:":
+            self._conexao_memoria = self._abrir_conexao(check_same_thread=False)
+            self._lock_memoria = threading.Lock()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(ESQUEMA)
+
+    def _abrir_conexao(self, **kwargs):
+        conexao = sqlite3.connect(self.caminho, timeout=30, **kwargs)
+        conexao.row_factory = sqlite3.Row
+        conexao.execute("PRAGMA foreign_keys=ON")
+        return conexao
+
+    @contextmanager
+    def _conectar(self):
+        if self._conexao_memoria is not None:
+            with self._lock_memoria, self._conexao_memoria as conexao:
+                yield conexao
+            return
+        # Uma conexão por operação: sessões do Streamlit rodam em threads distintas
+        conexao = self._abrir_conexao()
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def ingerir(self, hash_arquivo, nome, tipo_detectado, registros):
+        """
+        Grava os registros extraídos de um arquivo novo ou alterado
+        Registros de outros arquivos com o mesmo documento são substituídos, e
+        a consolidação das chaves afetadas é recalculada na mesma transação
+        Retorna: conjunto de chaves (empresa, período) afetadas
+        """
+        afetadas = set()
+        versao = versao_extrator()
+        with self._conectar() as conexao:
+            existente = conexao.execute(
+                "SELECT versao_extrator FROM arquivos WHERE hash = ?", (hash_arquivo,)
+            ).fetchone()
+            if existente is not None and existente["versao_extrator"] == versao:
+                return afetadas
+
+            if existente is not None:
+                # Extraído por outra versão do extrator ou em outro modo
+                afetadas.update(
+                    (linha["empresa_norm"], linha["periodo"]) for linha in conexao.execute(
+                        "SELECT DISTINCT empresa_norm, periodo FROM registros WHERE hash = ?", (hash_arquivo,)
+                    )
+                )
+                conexao.execute("DELETE FROM arquivos WHERE hash = ?", (hash_arquivo,))
+
+            # Nova versão de documentos já gravados (ex.: retificadora ou arquivo regravado)
+            for dado in registros:
+                for linha in self._registros_do_documento(conexao, dado, hash_arquivo):
+                    afetadas.add((linha["empresa_norm"], linha["periodo"]))
+                    conexao.execute("DELETE FROM registros WHERE id = ?", (linha["id"],))
+
+            conexao.execute(
+                "INSERT INTO arquivos (hash, nome, tipo_detectado, versao_extrator, processado_em) VALUES (?, ?, ?, ?, ?)",
+                (hash_arquivo, nome, tipo_detectado, versao, datetime.now().isoformat(timespec="seconds"))
+            )
+            for dado in registros:
+                empresa_norm, periodo = chave_consolidacao(dado)
+                afetadas.add((empresa_norm, periodo))
+                conexao.execute(
+                    "INSERT INTO registros (hash, tipo_documento, empresa_norm, periodo, cnpj_norm, dados) VALUES (?, ?, ?, ?, ?, ?)",
+                    (hash_arquivo, dado.get("Tipo_Documento"), empresa_norm, periodo,
+                     normalizar_cnpj(dado.get("CNPJ")), json.dumps(dado, ensure_ascii=False))
+                )
+            # Na mesma transação: um lote interrompido não deixa consolidação desatualizada
+            self._reconsolidar(conexao, afetadas)
+            if afetadas:
+                # Versão dos dados no próprio banco: vale também para gravações de outros processos
+                versao_dados = conexao.execute("PRAGMA user_version").fetchone()[0]
+                conexao.execute(f"PRAGMA user_version = {versao_dados + 1}")
+        return afetadas
+
+    def _registros_do_documento(self, conexao, dado, hash_arquivo):
+        """
+        Registros de outros arquivos com a mesma chave de documento do registro
+        """
+        chave = chave_documento(dado)
+        if chave is None:
+            return []
+        tipo, identificacao, periodo = chave
+        cnpj = normalizar_cnpj(dado.get("CNPJ"))
+        # Candidatos pelos índices de CNPJ ou de empresa/período, conferidos pela chave completa
+        if cnpj:
+            linhas = conexao.execute(
+                "SELECT id, empresa_norm, periodo, dados FROM registros WHERE cnpj_norm = ? AND periodo = ? AND hash != ?",
+                (cnpj, periodo, hash_arquivo)
+            )
+        else:
+            linhas = conexao.execute(
+                "SELECT id, empresa_norm, periodo, dados FROM registros WHERE empresa_norm = ? AND periodo = ? AND hash != ?",
+                (identificacao, periodo, hash_arquivo)
+            )
+        return [linha for linha in linhas if chave_documento(json.loads(linha["dados"])) == chave]
+
+    def _reconsolidar(self, conexao, chaves):
+        """
+        Recalcula a consolidação apenas das chaves (empresa, período) informadas
+        """
+        consolidacao = ConsolidacaoIncremental()
+        for empresa_norm, periodo in chaves:
+            conexao.execute(
+                "DELETE FROM consolidados WHERE empresa IS ? AND periodo IS ?", (empresa_norm, periodo)
+            )
+            consolidacao.adicionar_todos(
+                json.loads(linha["dados"]) for linha in conexao.execute(
+                    "SELECT dados FROM registros WHERE empresa_norm IS ? AND periodo IS ? ORDER BY id",
+                    (empresa_norm, periodo)
+                )
+            )
+        # Uma única consolidação para todas as chaves, sem DataFrame por chave
+        conexao.executemany(
+            f"INSERT OR REPLACE INTO consolidados ({', '.join(COLUNAS_CONSOLIDADOS)}) "
+            f"VALUES ({', '.join('?' * len(COLUNAS_CONSOLIDADOS))})",
+            (
+                [_nulo_se_nan(linha[campo]) for campo in COLUNAS_CONSOLIDADOS.values()]
+                for linha in consolidacao.dados_consolidados()
+            )
+        )
+
+    def versao_dados(self):
+        """
+        Versão da consolidação armazenada, incrementada a cada ingestão que a altera
+        """
+        with self._conectar() as conexao:
+            return conexao.execute("PRAGMA user_version").fetchone()[0]
+
+    def dados_consolidados(self):
+        """
+        Consolidação completa armazenada, no formato de consolidar_dados_empresa
+        """
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                f"SELECT {', '.join(COLUNAS_CONSOLIDADOS)} FROM consolidados ORDER BY empresa, periodo"
+            ).fetchall()
+        return [{campo: linha[coluna] for coluna, campo in COLUNAS_CONSOLIDADOS.items()} for linha in linhas]
+
+    def registros(self, cnpj=None, empresa=None, periodo=None):
+        """
+        Registros extraídos, opcionalmente filtrados por CNPJ, empresa e período
+        """
+        condicoes = []
+        parametros = []
+        if cnpj:
+            condicoes.append("cnpj_norm = ?")
+            parametros.append(normalizar_cnpj(cnpj))
+        if empresa:
+            condicoes.append("empresa_norm = ?")
+            parametros.append(empresa.strip().upper())
+        if periodo:
+            condicoes.append("periodo = ?")
+            parametros.append(periodo)
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        with self._conectar() as conexao:
+            linhas = conexao.execute(f"SELECT dados FROM registros {where} ORDER BY id", parametros).fetchall()
+        return [json.loads(linha["dados"]) for linha in linhas]
+
+
+def _nulo_se_nan(valor):
+    """
+    SQLite não tem NaN; valores ausentes viram NULL
+    """
+    if isinstance(valor, float) and valor != valor:
+        return None
+    return valor
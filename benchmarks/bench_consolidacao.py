@@ -0,0 +1,74 @@
+"""
+Benchmark de consolidar_dados_empresa com registros sintéticos
+
+Uso:
+    python benchmarks/bench_consolidacao.py [--registros 1000000] [--empresas 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consolidacao import consolidar_dados_empresa
+
+
+def gerar_registros(quantidade, empresas, meses=60, semente=42):
+    """
+    Registros no formato devolvido pelos extratores, metade ENTRADAS e metade PGDAS
+    """
+    aleatorio = random.Random(semente)
+    nomes = [f"EMPRESA {i:05d} LTDA" for i in range(empresas)]
+    periodos = [f"{mes:02d}/{ano}" for ano in range(2020, 2020 + meses // 12 + 1) for mes in range(1, 13)][:meses]
+    registros = []
+    for i in range(quantidade):
+        empresa = aleatorio.choice(nomes)
+        periodo = aleatorio.choice(periodos)
+        if i % 2:
+            registros.append({
+                "Empresa": empresa,
+                "CNPJ": f"{zlib.crc32(empresa.encode()) % 10**8:08d}/0001-00",
+                "Período": periodo,
+                "Total de Entradas": round(aleatorio.uniform(0, 1e6), 2),
+                "Tipo_Documento": "ENTRADAS"
+            })
+        else:
+            registros.append({
+                "CNPJ": None,
+                "Empresa": empresa,
+                "Período de Apuração": periodo,
+                "RBT12": f"{aleatorio.uniform(0, 4.8e6):,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+                "Receita Bruta Informada": f"{aleatorio.uniform(0, 4e5):,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+                "Total do Débito Declarado": "Não encontrado" if i % 7 == 0 else f"{aleatorio.uniform(0, 4e4):.2f}".replace(".", ","),
+                "Tipo_Documento": "PGDAS"
+            })
+    return registros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--registros", type=int, default=1_000_000)
+    parser.add_argument("--empresas", type=int, default=5_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    registros = gerar_registros(args.registros, args.empresas)
+    print(f"{len(registros)} registros gerados em {time.perf_counter() - inicio:.2f}s")
+
+    tempos = []
+    for _ in range(args.repeticoes):
+        inicio = time.perf_counter()
+        consolidados = consolidar_dados_empresa(registros)
+        tempos.append(time.perf_counter() - inicio)
+
+    melhor = min(tempos)
+    print(f"consolidar_dados_empresa: {melhor:.2f}s (melhor de {args.repeticoes}), "
+          f"{len(registros) / melhor:,.0f} registros/s -> {len(consolidados)} linhas")
+
+
+if __name__ == "__main__":
+    main()
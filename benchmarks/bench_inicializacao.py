@@ -0,0 +1,131 @@
+"""
+Benchmark da inicialização: primeira exibição da página e primeiro lote
+
+Cada medida roda em um interpretador novo, como em um contêiner recém-criado:
+- primeira página: execução do app.py sem arquivos enviados, como está e com
+  pandas, pdfplumber e openpyxl importados antes (o que a página pagava quando
+  os importava no topo)
+- primeiro lote: extração de um lote pequeno em processos recém-criados e em
+  processos já preaquecidos (EXTRACAO_PREAQUECER)
+
+Uso:
+    python benchmarks/bench_inicializacao.py [--repeticoes 5] [--arquivos 8] [--workers 2]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Módulos que a página vazia não deve carregar
+MODULOS_PESADOS = ["pandas", "pdfplumber", "openpyxl", "pyarrow"]
+
+
+def medir_pagina(antecipar):
+    """
+    Tempo da primeira execução do app sem arquivos; com `antecipar`, os
+    módulos pesados são importados antes, dentro da medição
+    """
+    from streamlit.testing.v1 import AppTest
+
+    inicio = time.perf_counter()
+    if antecipar:
+        for modulo in MODULOS_PESADOS[:3]:
+            __import__(modulo)
+    app = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=60).run()
+    duracao = time.perf_counter() - inicio
+    if app.exception:
+        raise RuntimeError(f"Erro na execução do app: {app.exception[0].value}")
+    return {"segundos": duracao, "carregados": [modulo for modulo in MODULOS_PESADOS if modulo in sys.modules]}
+
+
+def medir_lote(arquivos, workers, aquecer):
+    """
+    Tempo do primeiro lote de extração; com `aquecer`, os processos são
+    preaquecidos antes e a medição começa quando estão prontos
+    """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from corpus import gerar_documentos
+    from processamento import processar_arquivos, preaquecer
+
+    documentos = [(nome, conteudo) for nome, conteudo, _ in gerar_documentos(arquivos, paginas=2)]
+    if aquecer:
+        for futuro in preaquecer(workers):
+            futuro.result()
+
+    inicio = time.perf_counter()
+    resultados = list(processar_arquivos(documentos, max_workers=workers))
+    duracao = time.perf_counter() - inicio
+    erros = [resultado.nome for resultado in resultados if resultado.erro]
+    if erros:
+        raise RuntimeError(f"Erro na extração de {', '.join(erros)}")
+    return {"segundos": duracao}
+
+
+def _em_processo_novo(caso, args):
+    """
+    Roda uma medida em um interpretador novo; retorna o dicionário medido
+    """
+    comando = [sys.executable, os.path.abspath(__file__), "--medir", caso,
+               "--arquivos", str(args.arquivos), "--workers", str(args.workers)]
+    saida = subprocess.run(comando, capture_output=True, text=True, cwd=RAIZ, env={**os.environ, "EXTRACAO_CACHE_DIR": ""})
+    if saida.returncode != 0:
+        raise RuntimeError(f"Medida {caso} falhou:\n{saida.stderr}")
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+CASOS = {
+    "primeira_pagina_s": lambda args: medir_pagina(antecipar=False),
+    "primeira_pagina_com_importacoes_s": lambda args: medir_pagina(antecipar=True),
+    "primeiro_lote_frio_s": lambda args: medir_lote(args.arquivos, args.workers, aquecer=False),
+    "primeiro_lote_preaquecido_s": lambda args: medir_lote(args.arquivos, args.workers, aquecer=True),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5, help="Interpretadores novos por medida (vale a mediana)")
+    parser.add_argument("--arquivos", type=int, default=8, help="Arquivos do primeiro lote")
+    parser.add_argument("--workers", type=int, default=2, help="Processos de extração do primeiro lote")
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    parser.add_argument("--medir", choices=list(CASOS), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.medir:
+        print(json.dumps(CASOS[args.medir](args)))
+        return 0
+
+    medidas = {}
+    carregados = []
+    for caso in CASOS:
+        execucoes = [_em_processo_novo(caso, args) for _ in range(args.repeticoes)]
+        medidas[caso] = statistics.median(execucao["segundos"] for execucao in execucoes)
+        if caso == "primeira_pagina_s":
+            carregados = execucoes[0]["carregados"]
+
+    print("-" * 72)
+    for medida, valor in medidas.items():
+        print(f"{medida:<38} {valor:>14,.3f}")
+    print(f"{'ganho_primeira_pagina_s':<38} {medidas['primeira_pagina_com_importacoes_s'] - medidas['primeira_pagina_s']:>14,.3f}")
+    print(f"{'ganho_primeiro_lote_s':<38} {medidas['primeiro_lote_frio_s'] - medidas['primeiro_lote_preaquecido_s']:>14,.3f}")
+    print(f"Módulos pesados carregados pela página vazia: {', '.join(carregados) or 'nenhum'}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"parametros": {"arquivos": args.arquivos, "workers": args.workers}, "medidas": medidas,
+                       "carregados": carregados}, f, ensure_ascii=False, indent=2)
+
+    # A página vazia não deve voltar a importar os módulos pesados
+    if carregados:
+        print(f"\nERRO: a primeira página importou {', '.join(carregados)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
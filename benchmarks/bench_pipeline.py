@@ -0,0 +1,277 @@
+"""
+Benchmark do pipeline completo sobre um corpus sintético de PDFs
+
+Mede arquivos/s, latência por arquivo e por etapa (hash, abertura, texto,
+classificação, extração), consolidação, indicadores, exportação e pico de memória, e
+compara com a linha de base gravada; termina com código 1 se alguma medida
+piorar além da tolerância ou se a extração deixar de devolver os registros
+esperados
+
+Uso:
+    python benchmarks/bench_pipeline.py [--arquivos 40] [--paginas 2] [--workers 1]
+    python benchmarks/bench_pipeline.py --salvar-baseline
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import extracao
+import processamento
+from processamento import processar_arquivos
+from consolidacao import consolidar_dados_empresa
+from exportacao import gerar_exportacao
+from analise import calcular_indicadores
+from metricas import MetricasLote
+
+from corpus import gerar_documentos
+from bench_consolidacao import gerar_registros
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Etapas medidas por arquivo, reportadas em ms por arquivo
+ETAPAS_ARQUIVO = ["hash", "abertura", "texto", "classificacao", "extracao"]
+
+# Piora relativa tolerada em relação à linha de base
+TOLERANCIA = 0.25
+
+# Arquivos usados na medição de memória da extração (o tracemalloc deixa o pdfplumber bem mais lento)
+ARQUIVOS_MEMORIA = 10
+
+# Diferenças absolutas abaixo destes valores são ruído, qualquer que seja a piora relativa
+PISO_POR_UNIDADE = {"_ms": 1.0, "_s": 0.02, "_mb": 2.0, "_por_segundo": 0.0}
+
+
+def _percentil(valores, percentil):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(percentil * len(valores)))]
+
+
+def _repetir(repeticoes, funcao):
+    """
+    Executa a função `repeticoes` vezes; retorna a lista de (tempo, resultado)
+    """
+    execucoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        execucoes.append((time.perf_counter() - inicio, resultado))
+    return execucoes
+
+
+def _melhor_de(repeticoes, funcao):
+    """
+    Retorna (menor tempo, resultado dessa execução)
+    """
+    return min(_repetir(repeticoes, funcao), key=lambda execucao: execucao[0])
+
+
+def _pico_memoria_mb(funcao):
+    """
+    Pico de memória alocada pelo Python durante a função, em MB
+    """
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico / 1024 / 1024
+
+
+def extrair(documentos, workers):
+    """
+    Extrai o corpus sem cache; retorna (MetricasLote, resultados na ordem do corpus)
+    """
+    lote = MetricasLote()
+    resultados = {}
+    arquivos = [(nome, conteudo) for nome, conteudo, _ in documentos]
+    for resultado in processar_arquivos(arquivos, max_workers=workers):
+        lote.registrar(resultado)
+        resultados[resultado.nome] = resultado
+    return lote, [resultados[nome] for nome, _, _ in documentos]
+
+
+def conferir(documentos, resultados):
+    """
+    Nomes dos arquivos cuja extração difere do registro esperado
+    """
+    return [
+        nome for (nome, _, esperado), resultado in zip(documentos, resultados)
+        if resultado.erro or resultado.tipo_detectado != esperado["Tipo_Documento"] or resultado.registros != [esperado]
+    ]
+
+
+def executar(args):
+    """
+    Roda o benchmark; retorna o dicionário com parâmetros e medidas
+    """
+    # Processos de extração leem o modo do ambiente ao importar o módulo
+    os.environ["EXTRACAO_MODO"] = extracao.MODO_EXTRACAO = args.modo
+    # Sem limite de memória, a extração com um processo roda neste processo,
+    # onde o tracemalloc consegue medi-la
+    processamento.LIMITE_MB_ARQUIVO = 0
+
+    inicio = time.perf_counter()
+    documentos = gerar_documentos(args.arquivos, args.paginas, args.proporcao_entradas, semente=args.semente)
+    print(f"Corpus: {len(documentos)} PDFs, {sum(len(c) for _, c, _ in documentos) / 1024 / 1024:.1f} MB "
+          f"gerados em {time.perf_counter() - inicio:.1f}s")
+
+    medidas = {}
+
+    # Extração (classificação incluída); a latência de cada arquivo é a menor
+    # entre as repetições, para que um único atraso não mova os percentis
+    execucoes = _repetir(args.repeticoes, lambda: extrair(documentos, args.workers))
+    duracao, (lote, resultados) = min(execucoes, key=lambda execucao: execucao[0])
+    divergentes = conferir(documentos, resultados)
+    medidas["arquivos_por_segundo"] = len(documentos) / duracao
+    duracoes = [
+        min(execucao[1][1][indice].duracao for execucao in execucoes) * 1000
+        for indice in range(len(documentos))
+    ]
+    medidas["latencia_arquivo_p50_ms"] = _percentil(duracoes, 0.5)
+    medidas["latencia_arquivo_p95_ms"] = _percentil(duracoes, 0.95)
+    totais = lote.totais_etapas()
+    for etapa in ETAPAS_ARQUIVO:
+        medidas[f"etapa_{etapa}_ms"] = totais[etapa] * 1000 / len(documentos)
+    contadores = lote.totais_contadores()
+    medidas["paginas_lidas_por_arquivo"] = contadores.get("paginas_lidas", 0) / len(documentos)
+
+    # Consolidação e exportação sobre registros sintéticos em volume
+    registros = gerar_registros(args.registros, args.empresas)
+    duracao, consolidados = _melhor_de(args.repeticoes, lambda: consolidar_dados_empresa(registros))
+    medidas["consolidacao_registros_por_segundo"] = len(registros) / duracao
+
+    df = pd.DataFrame(consolidados)
+    duracao, _ = _melhor_de(args.repeticoes, lambda: calcular_indicadores(df))
+    medidas["indicadores_linhas_por_segundo"] = len(df) / duracao
+
+    duracao, _ = _melhor_de(args.repeticoes, lambda: gerar_exportacao(df, args.formato))
+    medidas["exportacao_s"] = duracao
+
+    # Pico de memória em uma passada à parte: o tracemalloc distorce os tempos
+    # e só enxerga o processo atual, então a extração roda sem processos auxiliares
+    medidas["memoria_pico_extracao_mb"] = _pico_memoria_mb(lambda: extrair(documentos[:ARQUIVOS_MEMORIA], 1))
+    medidas["memoria_pico_consolidacao_mb"] = _pico_memoria_mb(lambda: consolidar_dados_empresa(registros))
+    medidas["memoria_pico_exportacao_mb"] = _pico_memoria_mb(lambda: gerar_exportacao(df, args.formato))
+
+    parametros = {
+        "arquivos": args.arquivos,
+        "paginas": args.paginas,
+        "proporcao_entradas": args.proporcao_entradas,
+        "semente": args.semente,
+        "workers": args.workers,
+        "modo": args.modo,
+        "registros": args.registros,
+        "empresas": args.empresas,
+        "formato": args.formato,
+    }
+    return {"parametros": parametros, "medidas": medidas, "divergentes": divergentes}
+
+
+def _maior_melhor(medida):
+    return medida.endswith("_por_segundo")
+
+
+def _piso(medida):
+    for sufixo, piso in PISO_POR_UNIDADE.items():
+        if medida.endswith(sufixo):
+            return piso
+    return 0.0
+
+
+def comparar(atual, base, tolerancia):
+    """
+    Compara as medidas com a linha de base
+    Retorna: lista de (medida, base, atual, piora relativa, regrediu)
+    """
+    comparacao = []
+    for medida, valor_base in base["medidas"].items():
+        valor = atual["medidas"].get(medida)
+        if valor is None:
+            continue
+        diferenca = valor_base - valor if _maior_melhor(medida) else valor - valor_base
+        piora = diferenca / valor_base if valor_base else 0.0
+        regrediu = piora > tolerancia and diferenca > _piso(medida)
+        comparacao.append((medida, valor_base, valor, piora, regrediu))
+    return comparacao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--arquivos", type=int, default=40)
+    parser.add_argument("--paginas", type=int, default=2, help="Páginas de detalhe por documento")
+    parser.add_argument("--proporcao-entradas", type=float, default=0.5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos de extração (padrão 1, para resultados comparáveis entre máquinas)")
+    parser.add_argument("--modo", choices=["direcionado", "completo"], default="direcionado",
+                        help="Modo de extração (EXTRACAO_MODO)")
+    parser.add_argument("--registros", type=int, default=20_000, help="Registros sintéticos da consolidação")
+    parser.add_argument("--empresas", type=int, default=500)
+    parser.add_argument("--formato", choices=["xlsx", "csv", "parquet"], default="xlsx")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE, help="Arquivo JSON da linha de base")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava o resultado como nova linha de base")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="Piora relativa tolerada antes de acusar regressão (padrão: 0.25)")
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args)
+    medidas = resultado["medidas"]
+
+    print("-" * 72)
+    for medida, valor in medidas.items():
+        print(f"{medida:<38} {valor:>14,.3f}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    if resultado["divergentes"]:
+        print(f"\nERRO: {len(resultado['divergentes'])} arquivo(s) extraídos com resultado diferente do esperado: "
+              f"{', '.join(resultado['divergentes'][:5])}", file=sys.stderr)
+        return 1
+
+    if args.salvar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"parametros": resultado["parametros"], "medidas": medidas}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nLinha de base gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nSem linha de base em {args.baseline}; use --salvar-baseline para criá-la")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    if base["parametros"] != resultado["parametros"]:
+        print(f"\nParâmetros diferentes da linha de base, comparação não é válida: {base['parametros']}",
+              file=sys.stderr)
+        return 2
+
+    print("-" * 72)
+    print(f"{'medida':<38} {'base':>10} {'atual':>10} {'piora':>8}")
+    regressoes = 0
+    for medida, valor_base, valor, piora, regrediu in comparar(resultado, base, args.tolerancia):
+        regressoes += regrediu
+        print(f"{medida:<38} {valor_base:>10,.2f} {valor:>10,.2f} {piora:>+8.0%}{'  REGRESSÃO' if regrediu else ''}")
+
+    if regressoes:
+        print(f"\n{regressoes} medida(s) pioraram mais de {args.tolerancia:.0%} em relação à linha de base",
+              file=sys.stderr)
+        return 1
+    print("\nSem regressões em relação à linha de base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Corpus sintético de PDFs de PGDAS e Entradas para os benchmarks
+
+Os PDFs seguem o layout lido pelas regras de extrair_dados_pgdas e
+extrair_dados_entradas e são gerados sem dependências, com texto simples
+em Helvetica. Junto com cada arquivo é devolvido o registro esperado, para
+conferir se a extração continua correta.
+
+Uso:
+    python benchmarks/corpus.py saida/ [--arquivos 200] [--paginas 5]
+"""
+import argparse
+import os
+import random
+import sys
+import zlib
+
+PALAVRAS_NOME = [
+    "ALFA", "BETA", "GAMA", "DELTA", "SIGMA", "OMEGA", "AURORA", "HORIZONTE",
+    "PRIMAVERA", "ESTRELA", "CENTRAL", "NOVA", "UNIAO", "PIONEIRA", "ATLANTICO", "SERRA",
+]
+ATIVIDADES = [
+    "COMERCIO", "SERVICOS", "INDUSTRIA", "TRANSPORTES", "ALIMENTOS",
+    "CONSTRUCOES", "TECNOLOGIA", "DISTRIBUIDORA", "CONFECCOES", "MATERIAIS",
+]
+TRIBUTOS = ["IRPJ", "CSLL", "COFINS", "PIS/Pasep", "INSS/CPP", "ICMS", "IPI", "ISS"]
+
+LINHAS_POR_PAGINA = 50
+
+
+def _escapar(linha):
+    texto = linha.encode("cp1252").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    return b"(" + texto + b") Tj T*"
+
+
+def gerar_pdf(paginas):
+    """
+    PDF mínimo com uma linha de texto por item de cada página
+    paginas: lista de páginas, cada uma uma lista de linhas
+    Retorna: conteúdo do PDF em bytes
+    """
+    objetos = []
+
+    def adicionar(conteudo):
+        objetos.append(conteudo)
+        return len(objetos)
+
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    # Cada página ocupa dois objetos (conteúdo e página); o nó /Pages vem depois delas
+    id_paginas = len(objetos) + 1 + 2 * len(paginas)
+    filhos = []
+    for linhas in paginas:
+        operacoes = b"\n".join([b"BT /F1 9 Tf 12 TL 40 800 Td"] + [_escapar(linha) for linha in linhas] + [b"ET"])
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n" % len(operacoes) + operacoes + b"\nendstream")
+        filhos.append(adicionar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (id_paginas, conteudo, fonte)
+        ))
+    adicionar(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % filho for filho in filhos), len(filhos)))
+    catalogo = adicionar(b"<< /Type /Catalog /Pages %d 0 R >>" % id_paginas)
+
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for numero, objeto in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    saida += b"".join(b"%010d 00000 n \n" % posicao for posicao in posicoes)
+    saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, catalogo, inicio_xref)
+    return bytes(saida)
+
+
+def valor_brasileiro(valor):
+    """
+    1234567.891 -> "1.234.567,89"
+    """
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def gerar_empresas(quantidade, semente=42):
+    """
+    Empresas com nome (só letras, como exige a regra de Entradas) e CNPJ
+    """
+    aleatorio = random.Random(semente)
+    nomes = [
+        f"{primeira} {segunda} {atividade} LTDA"
+        for atividade in ATIVIDADES for primeira in PALAVRAS_NOME for segunda in PALAVRAS_NOME if primeira != segunda
+    ]
+    aleatorio.shuffle(nomes)
+    if quantidade > len(nomes):
+        raise ValueError(f"No máximo {len(nomes)} empresas distintas")
+    empresas = []
+    for nome in nomes[:quantidade]:
+        base = zlib.crc32(nome.encode()) % 10**8
+        cnpj = f"{base // 10**6:02d}.{base // 1000 % 1000:03d}.{base % 1000:03d}/0001-{aleatorio.randrange(100):02d}"
+        empresas.append((nome, cnpj))
+    return empresas
+
+
+def paginas_pgdas(empresa, cnpj, periodo, rbt12, receita, tributos, paginas_extras=0):
+    """
+    Declaração do PGDAS-D: cabeçalho na primeira página, páginas de
+    estabelecimentos e o quadro "Total Geral da Empresa" na última
+    """
+    primeira = [
+        "Programa Gerador do DAS para o Simples Nacional - PGDAS-D",
+        "Declaração de Apuração",
+        f"Período de Apuração (PA): {periodo}",
+        f"CNPJ Básico: {cnpj[:10]}",
+        f"Nome Empresarial: {empresa}",
+        "Receita bruta acumulada nos doze meses anteriores ao PA",
+        valor_brasileiro(rbt12),
+        f"Receita Bruta do PA (RPA) - Competência {valor_brasileiro(receita)}",
+    ]
+    paginas = [primeira]
+    for numero in range(paginas_extras):
+        paginas.append([f"Estabelecimento {numero + 1:04d} - Detalhamento da receita por atividade"] + [
+            f"Atividade {linha + 1:02d} - Revenda de mercadorias sem substituição tributária"
+            for linha in range(LINHAS_POR_PAGINA)
+        ])
+    paginas.append([
+        "Total Geral da Empresa",
+        " ".join(TRIBUTOS) + " Total",
+        " ".join(valor_brasileiro(valor) for valor in tributos) + " " + valor_brasileiro(sum(tributos)),
+    ])
+    return paginas
+
+
+def paginas_entradas(empresa, cnpj, mes, ano, total, notas, paginas_extras=0):
+    """
+    Relatório de Entradas: cabeçalho, notas fiscais e o total na última página
+    """
+    paginas = [[
+        "Relatório de Entradas",
+        empresa,
+        f"CNPJ: {cnpj}",
+        f"Período: 01/{mes:02d}/{ano} até 28/{mes:02d}/{ano}",
+        "Entradas do Período",
+    ]]
+    for numero in range(paginas_extras):
+        paginas.append([
+            f"NF {numero * LINHAS_POR_PAGINA + linha + 1:06d}  {1 + linha % 28:02d}/{mes:02d}/{ano}  "
+            f"FORNECEDOR {linha % 7 + 1}  {valor_brasileiro(notas[(numero * LINHAS_POR_PAGINA + linha) % len(notas)])}"
+            for linha in range(LINHAS_POR_PAGINA)
+        ])
+    paginas.append([f"Total de Entradas: {valor_brasileiro(total)}"])
+    return paginas
+
+
+def gerar_documentos(arquivos, paginas=5, proporcao_entradas=0.5, empresas=50, semente=42):
+    """
+    Gera o corpus em memória
+    paginas: páginas de detalhe em cada documento, além do cabeçalho e do total
+    Retorna: lista de (nome, conteúdo do PDF, registro esperado)
+    """
+    aleatorio = random.Random(semente)
+    cadastro = gerar_empresas(min(empresas, arquivos), semente)
+    documentos = []
+    for indice in range(arquivos):
+        empresa, cnpj = cadastro[indice % len(cadastro)]
+        mes = 1 + indice // len(cadastro) % 12
+        ano = 2024 + indice // (len(cadastro) * 12)
+
+        if aleatorio.random() < proporcao_entradas:
+            notas = [round(aleatorio.uniform(10, 5e4), 2) for _ in range(LINHAS_POR_PAGINA)]
+            total = round(sum(notas), 2)
+            conteudo = gerar_pdf(paginas_entradas(empresa, cnpj, mes, ano, total, notas, paginas))
+            esperado = {
+                "Empresa": empresa,
+                "CNPJ": cnpj,
+                "Período": f"{mes:02d}/{ano}",
+                "Total de Entradas": total,
+                "Tipo_Documento": "ENTRADAS",
+            }
+            nome = f"entradas_{indice:05d}.pdf"
+        else:
+            rbt12 = round(aleatorio.uniform(1e5, 4.8e6), 2)
+            receita = round(rbt12 / 12 * aleatorio.uniform(0.5, 1.5), 2)
+            tributos = [round(receita * aleatorio.uniform(0, 0.02), 2) for _ in TRIBUTOS]
+            conteudo = gerar_pdf(paginas_pgdas(empresa, cnpj, f"{mes:02d}/{ano}", rbt12, receita, tributos, paginas))
+            esperado = {
+                "CNPJ": None,
+                "Empresa": empresa,
+                "Período de Apuração": f"{mes:02d}/{ano}",
+                "RBT12": valor_brasileiro(rbt12),
+                "Receita Bruta Informada": valor_brasileiro(receita),
+                "Total do Débito Declarado": valor_brasileiro(sum(tributos)),
+                "Tipo_Documento": "PGDAS",
+            }
+            nome = f"pgdas_{indice:05d}.pdf"
+        documentos.append((nome, conteudo, esperado))
+    return documentos
+
+
+def gravar_corpus(diretorio, documentos):
+    """
+    Grava os PDFs no diretório; retorna os caminhos na ordem dos documentos
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    caminhos = []
+    for nome, conteudo, _ in documentos:
+        caminho = os.path.join(diretorio, nome)
+        with open(caminho, "wb") as f:
+            f.write(conteudo)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("diretorio")
+    parser.add_argument("--arquivos", type=int, default=200)
+    parser.add_argument("--paginas", type=int, default=5, help="Páginas de detalhe por documento")
+    parser.add_argument("--proporcao-entradas", type=float, default=0.5)
+    parser.add_argument("--empresas", type=int, default=50)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    documentos = gerar_documentos(args.arquivos, args.paginas, args.proporcao_entradas, args.empresas, args.semente)
+    gravar_corpus(args.diretorio, documentos)
+    tamanho = sum(len(conteudo) for _, conteudo, _ in documentos)
+    print(f"{len(documentos)} PDFs ({tamanho / 1024 / 1024:.1f} MB) gravados em {args.diretorio}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from extracao import versao_extrator
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_CACHE = os.environ.get(
+    "EXTRACAO_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "app-dados-empresas")
+)
+MAX_ITENS_MEMORIA = int(os.environ.get("EXTRACAO_CACHE_ITENS", 4096))
+MAX_MB_DISCO = int(os.environ.get("EXTRACAO_CACHE_MB", 256))
+
+
+def calcular_hash(conteudo):
+    """
+    SHA-256 do conteúdo do arquivo (bytes, memoryview ou caminho)
+    """
+    if isinstance(conteudo, (str, os.PathLike)):
+        sha = hashlib.sha256()
+        with open(conteudo, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloco)
+        return sha.hexdigest()
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+class CacheExtracao:
+    """
+    Cache dos resultados de extração por hash do arquivo e versão do extrator
+    LRU em memória com cópia em disco limitada por tamanho
+    """
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, max_itens=MAX_ITENS_MEMORIA, max_mb_disco=MAX_MB_DISCO):
+        self.diretorio = diretorio
+        self.max_itens = max_itens
+        self.max_bytes_disco = max_mb_disco * 1024 * 1024
+        self._memoria = OrderedDict()
+        self._quarentena = {}
+        self._lock = threading.Lock()
+        self._bytes_disco = None
+        if self.diretorio:
+            os.makedirs(self.diretorio, exist_ok=True)
+
+    def chave(self, hash_arquivo):
+        """
+        Chave do arquivo a partir de calcular_hash: muda quando o conteúdo, a
+        versão do extrator ou o modo de extração mudam
+        """
+        return f"{versao_extrator()}-{hash_arquivo}"
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.json")
+
+    def obter(self, chave):
+        """
+        Retorna (tipo_detectado, registros) ou None se não estiver no cache
+        """
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+
+        if not self.diretorio:
+            return None
+
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                tipo_detectado, registros = json.load(f)
+            # Atualiza o horário de acesso usado na remoção LRU do disco
+            os.utime(caminho)
+        except (OSError, ValueError):
+            return None
+
+        resultado = (tipo_detectado, registros)
+        self._guardar_memoria(chave, resultado)
+        return resultado
+
+    def guardar(self, chave, resultado):
+        """
+        Armazena (tipo_detectado, registros) em memória e em disco
+        """
+        self._guardar_memoria(chave, resultado)
+
+        if not self.diretorio:
+            return
+
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False)
+            os.replace(temporario, caminho)
+            self._limitar_disco(os.path.getsize(caminho))
+        except OSError as e:
+            logger.error(f"Erro ao gravar cache de extração: {str(e)}")
+
+    def _caminho_quarentena(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.quarentena.json")
+
+    def colocar_em_quarentena(self, chave, motivo, limites):
+        """
+        Registra um arquivo que excedeu os limites de extração, para que não
+        seja reprocessado a cada execução enquanto os limites forem os mesmos
+        """
+        registro = {"motivo": motivo, "limites": list(limites)}
+        with self._lock:
+            self._quarentena[chave] = registro
+
+        if not self.diretorio:
+            return
+        try:
+            with open(self._caminho_quarentena(chave), "w", encoding="utf-8") as f:
+                json.dump(registro, f, ensure_ascii=False)
+        except OSError as e:
+            logger.error(f"Erro ao gravar quarentena: {str(e)}")
+
+    def motivo_quarentena(self, chave, limites):
+        """
+        Motivo da quarentena do arquivo ou None se não estiver em quarentena
+        com os limites informados
+        """
+        with self._lock:
+            registro = self._quarentena.get(chave)
+
+        if registro is None and self.diretorio:
+            try:
+                with open(self._caminho_quarentena(chave), "r", encoding="utf-8") as f:
+                    registro = json.load(f)
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._quarentena[chave] = registro
+
+        if registro is None or registro["limites"] != list(limites):
+            return None
+        return registro["motivo"]
+
+    def _guardar_memoria(self, chave, resultado):
+        with self._lock:
+            self._memoria[chave] = resultado
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_itens:
+                self._memoria.popitem(last=False)
+
+    def _limitar_disco(self, bytes_gravados):
+        """
+        Remove os arquivos menos usados até caber no limite de tamanho
+        O diretório só é varrido na primeira gravação e quando o limite estoura
+        """
+        with self._lock:
+            if self._bytes_disco is not None:
+                self._bytes_disco += bytes_gravados
+                if self._bytes_disco <= self.max_bytes_disco:
+                    return
+
+            entradas = []
+            total = 0
+            with os.scandir(self.diretorio) as it:
+                for entrada in it:
+                    if entrada.name.endswith(".json"):
+                        stat = entrada.stat()
+                        entradas.append((stat.st_mtime, stat.st_size, entrada.path))
+                        total += stat.st_size
+
+            if total > self.max_bytes_disco:
+                for _, tamanho, caminho in sorted(entradas):
+                    try:
+                        os.remove(caminho)
+                    except OSError:
+                        continue
+                    total -= tamanho
+                    if total <= self.max_bytes_disco:
+                        break
+
+            self._bytes_disco = total
@@ -0,0 +1,167 @@
+"""
+Processamento em lote dos PDFs fiscais sem o servidor Streamlit
+
+Uso:
+    python cli.py pasta_ou_padrao [...] -o Dados_Consolidados.xlsx [-w 8]
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+
+
+def listar_pdfs(entradas):
+    """
+    Expande diretórios (recursivamente) e padrões glob em uma lista de PDFs
+    """
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _, nomes in os.walk(entrada):
+                arquivos.extend(os.path.join(raiz, nome) for nome in nomes if nome.lower().endswith(".pdf"))
+        else:
+            arquivos.extend(caminho for caminho in glob.glob(entrada, recursive=True) if os.path.isfile(caminho))
+    # Remove repetidos mantendo a ordem
+    return list(dict.fromkeys(sorted(arquivos)))
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        description="Extrai e consolida dados de PDFs de Entradas e PGDAS"
+    )
+    parser.add_argument("entradas", nargs="+", help="Diretórios ou padrões glob com os PDFs")
+    parser.add_argument("-o", "--saida", default="Dados_Consolidados.xlsx",
+                        help="Arquivo de saída; o formato vem da extensão (.xlsx, .csv, .parquet)")
+    parser.add_argument("-f", "--formato", choices=["xlsx", "csv", "parquet"],
+                        help="Força o formato de saída independente da extensão")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Número de processos de extração (padrão: um por núcleo)")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usa o cache de extração")
+    parser.add_argument("--banco", metavar="CAMINHO",
+                        help="Grava os registros no banco SQLite local, ingerindo só arquivos novos ou alterados")
+    parser.add_argument("--metricas", metavar="ARQUIVO",
+                        help="Grava os tempos por etapa e por arquivo; .prom gera texto Prometheus, demais extensões JSON")
+    parser.add_argument("--indicadores", action="store_true",
+                        help="Inclui na saída os indicadores de 12 meses, alíquota efetiva e faixa do Simples")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Não lista o tempo de cada arquivo")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    formato = args.formato or os.path.splitext(args.saida)[1].lstrip(".").lower()
+    if formato not in ("xlsx", "csv", "parquet"):
+        print(f"Formato de saída não suportado: {args.saida}", file=sys.stderr)
+        return 2
+
+    arquivos = listar_pdfs(args.entradas)
+    if not arquivos:
+        print("Nenhum PDF encontrado.", file=sys.stderr)
+        return 1
+
+    # Importações pesadas só depois de validar os argumentos
+    from processamento import processar_arquivos
+    from cache_extracao import CacheExtracao
+    from metricas import MetricasLote, coletar
+    from consolidacao import DetectorDuplicatas
+
+    cache = None if args.sem_cache else CacheExtracao()
+
+    armazenamento = None
+    chaves_afetadas = set()
+    if args.banco:
+        from armazenamento import ArmazenamentoDados
+        armazenamento = ArmazenamentoDados(args.banco)
+
+    lote = MetricasLote()
+    # (posição na lista de arquivos, registros que valem) de cada arquivo
+    aceitos = []
+    tipos = {"ENTRADAS": 0, "PGDAS": 0, "DESCONHECIDO": 0}
+    erros = 0
+    duplicatas = 0
+    detector = DetectorDuplicatas()
+    inicio = time.perf_counter()
+
+    resultados = processar_arquivos(((caminho, caminho) for caminho in arquivos), max_workers=args.workers, cache=cache)
+    for resultado in resultados:
+        lote.registrar(resultado)
+        if resultado.erro:
+            erros += 1
+            rotulo = "QUARENTENA" if resultado.quarentena else "ERRO"
+            print(f"{rotulo}  {resultado.nome}: {resultado.erro}", file=sys.stderr)
+            continue
+        if resultado.duplicata:
+            duplicatas += 1
+            print(f"DUPLICATA  {resultado.nome}: cópia de {resultado.duplicata}", file=sys.stderr)
+            continue
+        tipos[resultado.tipo_detectado] += 1
+        registros, substituidos, prevalecentes = detector.separar(resultado.nome, resultado.posicao, resultado.registros)
+        aceitos.append((resultado.posicao, registros))
+        # Quase-duplicatas: mesmo CNPJ, período e tipo; vale o arquivo listado por último
+        if substituidos:
+            duplicatas += 1
+            print(f"DUPLICATA  {resultado.nome}: mesmo CNPJ, período e tipo de {', '.join(substituidos)}; "
+                  f"valem os registros de {resultado.nome}", file=sys.stderr)
+        if prevalecentes:
+            duplicatas += 1
+            print(f"DUPLICATA  {resultado.nome}: mesmo CNPJ, período e tipo de {', '.join(prevalecentes)}; "
+                  f"{len(resultado.registros) - len(registros)} registro(s) não somado(s)", file=sys.stderr)
+        if armazenamento is not None and (registros or not resultado.registros):
+            chaves_afetadas |= armazenamento.ingerir(
+                resultado.hash, resultado.nome, resultado.tipo_detectado, registros
+            )
+        if not args.quiet:
+            print(f"{resultado.duracao:8.3f}s  {resultado.tipo_detectado:<12} "
+                  f"{len(resultado.registros):>3} registro(s)  {resultado.nome}")
+
+    tempo_extracao = time.perf_counter() - inicio
+
+    # Registros substituídos por arquivos listados depois, já processados, saem da soma
+    todos_dados = [dado for posicao, registros in aceitos for dado in registros if detector.vale(dado, posicao)]
+
+    if not todos_dados:
+        print("Nenhum dado foi encontrado nos PDFs.", file=sys.stderr)
+        return 1
+
+    from consolidacao import consolidar_dados_empresa
+    from exportacao import gerar_exportacao
+    from analise import calcular_indicadores, regras_em_vigor, COLUNAS_INDICADORES
+    import pandas as pd
+
+    inicio_saida = time.perf_counter()
+    with coletar(lote.coletor):
+        dados_consolidados = consolidar_dados_empresa(todos_dados)
+        df = pd.DataFrame(dados_consolidados)
+        indicadores = calcular_indicadores(df, regras_em_vigor())
+        df["Situação"] = indicadores["Situação"]
+        if args.indicadores:
+            df = df.join(indicadores[COLUNAS_INDICADORES])
+        conteudo = gerar_exportacao(df, formato)
+    with open(args.saida, "wb") as f:
+        f.write(conteudo)
+    tempo_saida = time.perf_counter() - inicio_saida
+
+    if args.metricas:
+        with open(args.metricas, "w", encoding="utf-8") as f:
+            f.write(lote.para_prometheus() if args.metricas.endswith(".prom") else lote.para_json())
+
+    total = len(arquivos)
+    print("-" * 60)
+    print(f"Arquivos: {total}  (Entradas: {tipos['ENTRADAS']}, PGDAS: {tipos['PGDAS']}, "
+          f"Não identificados: {tipos['DESCONHECIDO']}, Erros: {erros}, Duplicatas: {duplicatas})")
+    print(f"Extração: {tempo_extracao:.2f}s  ({total / max(tempo_extracao, 1e-9):.1f} arquivos/s)")
+    print(f"Consolidação, indicadores e exportação: {tempo_saida:.2f}s")
+    print(f"{len(todos_dados)} registros consolidados em {len(dados_consolidados)} linhas -> {args.saida}")
+    etapas = lote.totais_etapas()
+    print("Etapas: " + "  ".join(f"{etapa} {duracao:.2f}s" for etapa, duracao in etapas.items() if duracao))
+    if armazenamento is not None:
+        print(f"Banco: {len(chaves_afetadas)} empresa/período atualizados em {args.banco}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import numpy as np
+import pandas as pd
+import re
+from functools import lru_cache
+
+from metricas import medido
+
+@lru_cache(maxsize=None)
+def limpar_valor_monetario(valor_str):
+    """
+    Converte valor monetário do formato brasileiro para numérico
+    Ex: "1.099,85" -> 1099.85
+    """
+    if not valor_str or valor_str == "Não encontrado":
+        return 0.0
+    
+    # Remove R$ e espaços
+    valor_limpo = valor_str.replace('R$', '').replace(' ', '').strip()
+    
+    # Remove pontos (separador de milhar) e substitui vírgula por ponto (decimal)
+    valor_limpo = valor_limpo.replace('.', '').replace(',', '.')
+    
+    try:
+        return float(valor_limpo)
+    except:
+        return 0.0
+
+def normalizar_cnpj(cnpj):
+    """
+    Normaliza CNPJ removendo caracteres especiais e mantendo apenas números
+    """
+    if not cnpj or cnpj == "Não encontrado" or pd.isna(cnpj):
+        return ""
+    return re.sub(r'[^\d]', '', str(cnpj))
+
+def normalizar_nome_empresa(nome):
+    """
+    Normaliza nome da empresa para comparação
+    """
+    if not nome:
+        return ""
+    return nome.upper().strip()
+
+def chave_consolidacao(dado):
+    """
+    Chave (empresa normalizada, período) sob a qual o registro é consolidado
+    ENTRADAS usa "Período" e PGDAS usa "Período de Apuração"
+    """
+    if dado.get("Tipo_Documento") == "ENTRADAS":
+        periodo = dado.get("Período")
+    else:
+        periodo = dado.get("Período de Apuração")
+    return normalizar_nome_empresa(dado.get("Empresa")), periodo
+
+# Colunas extraídas -> colunas numéricas da planilha consolidada
+CAMPOS_NUMERICOS = {
+    "entrada": "Total de Entradas",
+    "saída": "Receita Bruta Informada",
+    "imposto": "Total do Débito Declarado",
+    "RBT12": "RBT12",
+}
+
+# Definir ordem das colunas
+ORDEM_COLUNAS = [
+    "Empresa",
+    "CNPJ",
+    "Período",
+    "RBT12",
+    "entrada",
+    "saída",
+    "imposto",
+    "Situação"
+]
+
+def converter_para_float(serie):
+    """
+    Converte série para float sem laço em Python
+    Números são mantidos, textos seguem limpar_valor_monetario e
+    ausentes ou "Não encontrado" viram NaN
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+
+    serie = serie.mask(serie == "Não encontrado")
+    # Sem nenhum texto (ex.: números e "Não encontrado") o acessor .str não se aplica
+    if pd.api.types.infer_dtype(serie, skipna=True) not in ("string", "mixed", "mixed-integer"):
+        return pd.to_numeric(serie, errors="coerce").astype(float)
+
+    # O acessor .str devolve NaN para valores que não são texto
+    texto = (
+        serie.str.replace('R$', '', regex=False)
+        .str.replace(' ', '', regex=False)
+        .str.strip()
+        .str.replace('.', '', regex=False)
+        .str.replace(',', '.', regex=False)
+    )
+    eh_texto = texto.notna().to_numpy()
+
+    # Texto inválido vale 0.0, como em limpar_valor_monetario
+    valores_texto = pd.to_numeric(texto, errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    valores_numericos = pd.to_numeric(serie.where(~eh_texto), errors="coerce").to_numpy(dtype=float)
+
+    return pd.Series(np.where(eh_texto, valores_texto, valores_numericos), index=serie.index)
+
+@medido("consolidacao")
+def consolidar_dados_empresa(dados_originais):
+    """
+    Consolida dados de ENTRADAS e PGDAS da mesma empresa e período
+    Usa lógica melhorada baseada em agrupamento por empresa + período
+    """
+    # Converter para DataFrame para facilitar o agrupamento
+    df = pd.DataFrame(dados_originais)
+    vazio = pd.Series(None, index=df.index, dtype=object)
+
+    # Normalizar nome da empresa (remove espaços extras, maiúsculas/minúsculas)
+    df["Empresa_norm"] = df["Empresa"].str.strip().str.upper()
+
+    # Usar período de acordo com o tipo de documento
+    eh_entradas = (df.get("Tipo_Documento", vazio) == "ENTRADAS").to_numpy()
+    df["periodo_consolidado"] = np.where(
+        eh_entradas,
+        df.get("Período", pd.Series("", index=df.index)),
+        df.get("Período de Apuração", pd.Series("", index=df.index))
+    )
+
+    # Mapear campos originais para os novos nomes já convertidos para float
+    for coluna, campo in CAMPOS_NUMERICOS.items():
+        df[coluna] = converter_para_float(df.get(campo, vazio))
+
+    # Agrupar por Empresa + Período; linhas sem período ficam de fora
+    chaves = ["Empresa_norm", "periodo_consolidado"]
+    df_final = df.groupby(chaves, sort=False, as_index=False)[list(CAMPOS_NUMERICOS)].sum(min_count=1)
+
+    # Mantém todos CNPJs encontrados, na ordem em que aparecem
+    cnpjs = df.get("CNPJ", vazio)
+    cnpjs = df.loc[cnpjs.notna() & (cnpjs != ""), chaves + ["CNPJ"]].drop_duplicates()
+    # Só grupos com mais de um CNPJ precisam da junção em Python
+    multiplos = cnpjs.duplicated(chaves, keep=False)
+    cnpjs = pd.concat([
+        cnpjs[~multiplos],
+        cnpjs[multiplos].groupby(chaves, sort=False, as_index=False)["CNPJ"].agg(", ".join)
+    ])
+    df_final = df_final.merge(cnpjs, on=chaves, how="left")
+
+    # Renomear colunas para o formato final
+    df_final = df_final.rename(columns={
+        "Empresa_norm": "Empresa",
+        "periodo_consolidado": "Período"
+    })
+
+    # Ausências ficam como None, e não NaN, como na saída original
+    df_final["CNPJ"] = df_final["CNPJ"].astype(object).where(df_final["CNPJ"].notna(), None)
+    for coluna in CAMPOS_NUMERICOS:
+        if df_final[coluna].isna().all():
+            df_final[coluna] = None
+
+    # Adicionar coluna Situação vazia
+    df_final["Situação"] = ""
+
+    # Ordenar por empresa e período
+    df_final = df_final.sort_values(["Empresa", "Período"], kind="stable")
+
+    # Converter de volta para lista de dicionários (zip de listas evita o
+    # custo por célula do to_dict('records'))
+    colunas = [df_final[coluna].tolist() for coluna in ORDEM_COLUNAS]
+    return [dict(zip(ORDEM_COLUNAS, valores)) for valores in zip(*colunas)]
+
+def _valor_float(valor):
+    """
+    Versão escalar de converter_para_float; None para valores ausentes
+    """
+    if valor is None or valor == "Não encontrado":
+        return None
+    if isinstance(valor, str):
+        return limpar_valor_monetario(valor)
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if valor != valor else valor
+
+class ConsolidacaoIncremental:
+    """
+    Acumulador da consolidação por (empresa normalizada, período)
+    Cada registro adicionado atualiza somas e CNPJs do seu grupo em O(1),
+    sem reagrupar os registros anteriores; o resultado equivale ao de
+    consolidar_dados_empresa sobre todos os registros adicionados
+    """
+
+    def __init__(self, dados=()):
+        self._grupos = {}
+        self._ordenados = None
+        for dado in dados:
+            self.adicionar(dado)
+
+    def __len__(self):
+        return len(self._grupos)
+
+    def adicionar(self, dado):
+        """
+        Acrescenta um registro extraído ao seu grupo
+        """
+        empresa, periodo = chave_consolidacao(dado)
+        # Registros sem empresa ou período ficam fora da consolidação
+        if not empresa or periodo is None or periodo != periodo:
+            return
+
+        chave = (empresa, periodo)
+        grupo = self._grupos.get(chave)
+        if grupo is None:
+            grupo = self._grupos[chave] = {"cnpjs": {}, **{coluna: None for coluna in CAMPOS_NUMERICOS}}
+            self._ordenados = None
+
+        cnpj = dado.get("CNPJ")
+        if cnpj and cnpj == cnpj:
+            grupo["cnpjs"][cnpj] = None
+
+        for coluna, campo in CAMPOS_NUMERICOS.items():
+            valor = _valor_float(dado.get(campo))
+            if valor is not None:
+                grupo[coluna] = valor if grupo[coluna] is None else grupo[coluna] + valor
+
+    def adicionar_todos(self, dados):
+        for dado in dados:
+            self.adicionar(dado)
+
+    def dados_consolidados(self):
+        """
+        Visão atual da consolidação, no formato de consolidar_dados_empresa
+        """
+        # A ordenação só é refeita quando surgem novos grupos
+        if self._ordenados is None:
+            self._ordenados = sorted(self._grupos)
+
+        dados_consolidados = []
+        for empresa, periodo in self._ordenados:
+            grupo = self._grupos[(empresa, periodo)]
+            linha = {
+                "Empresa": empresa,
+                "CNPJ": ", ".join(grupo["cnpjs"]) or None,
+                "Período": periodo,
+            }
+            linha.update((coluna, grupo[coluna]) for coluna in CAMPOS_NUMERICOS)
+            linha["Situação"] = ""
+            dados_consolidados.append({coluna: linha[coluna] for coluna in ORDEM_COLUNAS})
+        return dados_consolidados
+
+def chave_documento(dado):
+    """
+    Chave (tipo, CNPJ ou empresa normalizados, período) do documento de origem
+    Registros de arquivos diferentes com a mesma chave são quase certamente
+    o mesmo documento enviado duas vezes
+    Retorna None se o período ou a empresa não foram encontrados: o registro
+    não identifica o documento
+    """
+    empresa, periodo = chave_consolidacao(dado)
+    if dado.get("Empresa") == "Não encontrado":
+        empresa = ""
+    identificacao = normalizar_cnpj(dado.get("CNPJ")) or empresa
+    if not identificacao or not periodo or periodo != periodo or periodo == "Não encontrado":
+        return None
+    return dado.get("Tipo_Documento"), identificacao, periodo
+
+class DetectorDuplicatas:
+    """
+    Quase-duplicatas entre arquivos de um lote: mesmo CNPJ, período e tipo
+    em arquivos com conteúdo diferente (cópias exatas já são descartadas em
+    processar_arquivos). Em cada chave vale o arquivo enviado por último, de
+    maior posição no lote, como se os arquivos fossem gravados um a um na
+    ordem de envio: o resultado não depende da ordem em que terminam
+    """
+
+    def __init__(self):
+        # chave -> (posição, nome) do arquivo que vale
+        self._arquivos = {}
+
+    def separar(self, nome, posicao, registros):
+        """
+        Registra os registros do arquivo na posição `posicao` do lote
+        Retorna: (registros que valem, nomes dos arquivos com a mesma chave
+        que este substitui, nomes dos que valem no lugar dele)
+        """
+        novos = []
+        substituidos = {}
+        prevalecentes = {}
+        for dado in registros:
+            chave = chave_documento(dado)
+            if chave is None:
+                novos.append(dado)
+                continue
+            anterior = self._arquivos.get(chave)
+            if anterior is None or anterior[0] <= posicao:
+                self._arquivos[chave] = (posicao, nome)
+                novos.append(dado)
+                if anterior is not None and anterior[0] != posicao:
+                    substituidos[anterior[1]] = None
+            else:
+                prevalecentes[anterior[1]] = None
+        return novos, list(substituidos), list(prevalecentes)
+
+    def vale(self, dado, posicao):
+        """
+        Indica se o registro do arquivo na posição `posicao` ainda vale, isto
+        é, se nenhum arquivo enviado depois tem a mesma chave
+        """
+        chave = chave_documento(dado)
+        return chave is None or self._arquivos[chave][0] == posicao
@@ -0,0 +1,166 @@
+import bisect
+import numpy as np
+import pandas as pd
+
+from consolidacao import normalizar_cnpj, normalizar_nome_empresa
+
+FILTROS_DADOS = ["Todos", "Com Entradas", "Com PGDAS", "Completos"]
+TODAS_SITUACOES = "Todas"
+ORDENACOES = ["Empresa", "Período", "Entrada", "Imposto"]
+TAMANHOS_PAGINA = [50, 100, 250, 500]
+
+# Buscas com ao menos este número de dígitos (e só caracteres de CNPJ) usam o índice de CNPJ
+MIN_DIGITOS_CNPJ = 3
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceConsulta:
+    """
+    Índices pré-calculados sobre a tabela consolidada para busca, filtros e
+    ordenação sem percorrer o DataFrame a cada tecla digitada
+
+    - trigramas dos nomes de empresa (normalizados)
+    - CNPJs normalizados, inclusive quando a linha tem mais de um
+    - máscaras dos filtros de dados e códigos da situação
+    - ordenações já calculadas
+    """
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        total = len(self.df)
+
+        # Índices sobre os nomes distintos; cada linha aponta para o seu nome
+        codigos, nomes = pd.factorize(self.df["Empresa"])
+        self._codigos = codigos
+        self._nomes = [normalizar_nome_empresa(nome) for nome in nomes]
+        trigramas = {}
+        for codigo, nome in enumerate(self._nomes):
+            for trigrama in _trigramas(nome):
+                trigramas.setdefault(trigrama, []).append(codigo)
+        self._trigramas = {trigrama: np.array(codigos_nome) for trigrama, codigos_nome in trigramas.items()}
+
+        # CNPJ normalizado -> linhas, percorrendo só os valores distintos
+        codigos_cnpj, valores_cnpj = pd.factorize(self.df["CNPJ"])
+        linhas_por_codigo = pd.Series(np.arange(total)).groupby(codigos_cnpj).indices
+        cnpjs = {}
+        for codigo, valor in enumerate(valores_cnpj):
+            for cnpj in str(valor).split(","):
+                cnpj = normalizar_cnpj(cnpj)
+                if cnpj:
+                    cnpjs.setdefault(cnpj, []).append(linhas_por_codigo[codigo])
+        self._cnpjs = {cnpj: np.concatenate(linhas) for cnpj, linhas in cnpjs.items()}
+        self._cnpjs_ordenados = sorted(self._cnpjs)
+
+        # Máscaras dos filtros de dados
+        com_entradas = self.df["entrada"].notna().to_numpy()
+        com_pgdas = self.df["RBT12"].notna().to_numpy()
+        self._mascaras = {
+            "Todos": np.ones(total, dtype=bool),
+            "Com Entradas": com_entradas,
+            "Com PGDAS": com_pgdas,
+            "Completos": com_entradas & com_pgdas,
+        }
+
+        # Situação de cada linha como código, para filtrar sem comparar textos
+        if "Situação" in self.df:
+            self._codigos_situacao, situacoes = pd.factorize(self.df["Situação"])
+            self.situacoes = [str(situacao) for situacao in situacoes]
+        else:
+            self._codigos_situacao, self.situacoes = np.full(total, -1), []
+
+        # Ordenações: texto crescente; valores decrescentes com vazios no fim
+        self._ordens = {
+            "Empresa": self._ordem(self.df["Empresa"], crescente=True),
+            "Período": self._ordem(self.df["Período"], crescente=True),
+            "Entrada": self._ordem(self.df["entrada"], crescente=False),
+            "Imposto": self._ordem(self.df["imposto"], crescente=False),
+        }
+
+    @staticmethod
+    def _ordem(serie, crescente):
+        return serie.reset_index(drop=True).sort_values(
+            ascending=crescente, na_position="last", kind="stable"
+        ).index.to_numpy()
+
+    def _codigos_por_nome(self, busca):
+        """
+        Códigos dos nomes que contêm a busca
+        """
+        if len(busca) < 3:
+            # Sem trigrama: percorre os nomes distintos, não as linhas
+            return np.array([codigo for codigo, nome in enumerate(self._nomes) if busca in nome], dtype=np.intp)
+
+        # Interseção das listas de trigramas, começando pela menor
+        listas = []
+        for trigrama in _trigramas(busca):
+            lista = self._trigramas.get(trigrama)
+            if lista is None:
+                return np.array([], dtype=np.intp)
+            listas.append(lista)
+        listas.sort(key=len)
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+
+        # Trigramas em comum não garantem a substring inteira
+        return np.array([codigo for codigo in candidatos if busca in self._nomes[codigo]], dtype=np.intp)
+
+    def _linhas_por_cnpj(self, digitos):
+        """
+        Linhas cujo CNPJ normalizado começa com os dígitos informados
+        """
+        inicio = bisect.bisect_left(self._cnpjs_ordenados, digitos)
+        linhas = []
+        for cnpj in self._cnpjs_ordenados[inicio:]:
+            if not cnpj.startswith(digitos):
+                break
+            linhas.append(self._cnpjs[cnpj])
+        return np.concatenate(linhas) if linhas else np.array([], dtype=np.intp)
+
+    def mascara_busca(self, busca):
+        """
+        Máscara das linhas que atendem à busca por nome de empresa ou CNPJ
+        """
+        total = len(self.df)
+        busca = (busca or "").strip()
+        if not busca:
+            return np.ones(total, dtype=bool)
+
+        mascara = np.zeros(total, dtype=bool)
+
+        digitos = normalizar_cnpj(busca)
+        if len(digitos) >= MIN_DIGITOS_CNPJ and not busca.strip("0123456789./- "):
+            mascara[self._linhas_por_cnpj(digitos)] = True
+
+        codigos = self._codigos_por_nome(normalizar_nome_empresa(busca))
+        if len(codigos):
+            mascara |= np.isin(self._codigos, codigos)
+
+        return mascara
+
+    def selecionar(self, busca="", filtro_dados="Todos", ordenacao="Empresa", situacao=TODAS_SITUACOES):
+        """
+        Aplica busca, filtros de dados e de situação e ordenação usando os índices
+        Retorna: posições das linhas selecionadas, na ordem pedida
+        """
+        mascara = self.mascara_busca(busca) & self._mascaras[filtro_dados]
+        if situacao != TODAS_SITUACOES:
+            codigo = self.situacoes.index(situacao) if situacao in self.situacoes else -2
+            mascara &= self._codigos_situacao == codigo
+        ordem = self._ordens[ordenacao]
+        return ordem[mascara[ordem]]
+
+    def pagina(self, posicoes, numero, tamanho):
+        """
+        Fatia de uma seleção: só as linhas da página `numero` (a partir de 1)
+        são copiadas do DataFrame
+        """
+        inicio = (numero - 1) * tamanho
+        return self.df.iloc[posicoes[inicio:inicio + tamanho]]
+
+
+def total_paginas(total_linhas, tamanho):
+    return max(1, -(-total_linhas // tamanho))
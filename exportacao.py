@@ -0,0 +1,77 @@
+import hashlib
+import pandas as pd
+from io import BytesIO
+
+from metricas import medido
+
+# Formato -> (extensão, tipo MIME)
+FORMATOS = {
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".csv", "text/csv"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+NOME_PLANILHA = "Dados Consolidados"
+
+# Acima deste número de linhas o XLSX é gravado em modo write-only do openpyxl,
+# linha a linha, sem montar a planilha inteira em memória
+LIMITE_XLSX_STREAMING = 50_000
+
+# Linhas convertidas por vez no modo write-only
+TAMANHO_BLOCO = 10_000
+
+
+def impressao_digital(df):
+    """
+    Hash do conteúdo do DataFrame, usado como chave do cache de exportação
+    """
+    sha = hashlib.sha256()
+    sha.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+def _xlsx_streaming(df, output):
+    """
+    Grava o XLSX em modo write-only, convertendo blocos de linhas por vez
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet(NOME_PLANILHA)
+    planilha.append(list(df.columns))
+
+    for inicio in range(0, len(df), TAMANHO_BLOCO):
+        bloco = df.iloc[inicio:inicio + TAMANHO_BLOCO]
+        # Células vazias no lugar de NaN, como no to_excel
+        bloco = bloco.astype(object).where(bloco.notna(), None)
+        for linha in bloco.itertuples(index=False, name=None):
+            planilha.append(linha)
+
+    workbook.save(output)
+
+
+@medido("exportacao")
+def gerar_exportacao(df, formato="xlsx"):
+    """
+    Serializa o DataFrame consolidado no formato pedido
+    Retorna: conteúdo do arquivo em bytes
+    """
+    output = BytesIO()
+
+    if formato == "xlsx":
+        if len(df) > LIMITE_XLSX_STREAMING:
+            _xlsx_streaming(df, output)
+        else:
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                # Planilha principal
+                df.to_excel(writer, sheet_name=NOME_PLANILHA, index=False)
+    elif formato == "csv":
+        # BOM para o Excel reconhecer os acentos
+        df.to_csv(output, index=False, encoding="utf-8-sig")
+    elif formato == "parquet":
+        df.to_parquet(output, index=False)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+    return output.getvalue()
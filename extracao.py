@@ -0,0 +1,435 @@
+import io
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from regras_extracao import aplicar_regras, REGRAS_ENTRADAS, REGRAS_PGDAS
+from metricas import medir, medido, contar
+
+logger = logging.getLogger(__name__)
+
+# Incrementar sempre que a detecção ou a extração mudarem o resultado,
+# invalidando o cache de extração
+VERSAO_EXTRATOR = "3"
+
+# "direcionado" lê só as páginas onde os campos costumam estar, voltando à
+# leitura sequencial para o que não for encontrado; "completo" lê em ordem
+MODO_EXTRACAO = os.environ.get("EXTRACAO_MODO", "direcionado")
+
+
+def versao_extrator():
+    """
+    Versão dos resultados gravados no cache e no banco local: os modos podem
+    extrair valores diferentes do mesmo arquivo
+    """
+    return f"{VERSAO_EXTRATOR}-{MODO_EXTRACAO}"
+
+
+# Páginas lidas no modo direcionado: as primeiras para os campos do início
+# e as últimas, de trás para frente, para os campos do fim (totais)
+PAGINAS_INICIO = 1
+PAGINAS_FIM = 2
+
+# Limites por arquivo (0 desativa); quem passar deles vai para a quarentena
+# A memória é o aumento da memória residente do processo, medido no Linux
+LIMITE_SEGUNDOS_ARQUIVO = float(os.environ.get("EXTRACAO_LIMITE_SEGUNDOS", 120))
+LIMITE_MB_ARQUIVO = int(os.environ.get("EXTRACAO_LIMITE_ARQUIVO_MB", 1024))
+
+# Textos de página mantidos em memória por documento (os mais recentes)
+MAX_PAGINAS_MEMORIZADAS = 32
+
+
+class LimiteExcedido(Exception):
+    """
+    O arquivo excedeu o limite de tempo ou de memória da extração
+    """
+
+
+def _memoria_mb():
+    """
+    Memória residente do processo em MB; None fora do Linux
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _LeitorBuffer(io.RawIOBase):
+    """
+    Stream somente leitura sobre um buffer em memória, sem copiar o conteúdo
+    """
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast("B")
+        self._posicao = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._posicao
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._posicao
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._posicao = max(0, offset)
+        return self._posicao
+
+    def readinto(self, destino):
+        bloco = self._buffer[self._posicao:self._posicao + len(destino)]
+        destino[:len(bloco)] = bloco
+        self._posicao += len(bloco)
+        return len(bloco)
+
+
+def assinatura_documento(pdf_file):
+    """
+    Assinatura barata do conteúdo: número de páginas e fluxos de conteúdo da
+    primeira e da última página (cabeçalho e totais), sem análise de layout
+    Cópias renomeadas ou regravadas, com bytes diferentes, têm a mesma assinatura
+    Retorna: SHA-256 em hexadecimal ou None se o PDF não puder ser lido
+    """
+    # pdfminer/pdfplumber só são importados quando há PDF a ler: a interface
+    # e o cache usam este módulo sem pagar a importação na inicialização
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import resolve1
+
+    if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+        arquivo = io.BufferedReader(_LeitorBuffer(pdf_file))
+    else:
+        arquivo = open(pdf_file, "rb")
+    try:
+        paginas = list(PDFPage.create_pages(PDFDocument(PDFParser(arquivo))))
+        if not paginas:
+            return None
+        sha = hashlib.sha256(str(len(paginas)).encode())
+        # Primeira e última página, uma vez só em documentos de página única
+        for pagina in paginas[:1] + paginas[1:][-1:]:
+            for conteudo in pagina.contents:
+                sha.update(resolve1(conteudo).get_data())
+        return sha.hexdigest()
+    except Exception as e:
+        logger.warning(f"Assinatura do PDF não calculada: {str(e)}")
+        return None
+    finally:
+        arquivo.close()
+
+
+class DocumentoPDF:
+    """
+    PDF aberto uma única vez, com o texto de cada página extraído sob demanda
+    e reaproveitado pela detecção de tipo e pelos extratores
+    Aceita caminho, arquivo aberto ou o conteúdo em memória (bytes/memoryview)
+
+    Os objetos de layout de cada página são liberados logo após a extração do
+    texto, e só o texto das páginas mais recentes fica em memória; os limites
+    de tempo e memória são conferidos a cada página lida
+    """
+
+    def __init__(self, pdf_file, limite_segundos=None, limite_mb=None):
+        # Fora da medição de abertura: a importação é paga uma vez por processo
+        import pdfplumber
+
+        self._limite_segundos = LIMITE_SEGUNDOS_ARQUIVO if limite_segundos is None else limite_segundos
+        self._limite_mb = LIMITE_MB_ARQUIVO if limite_mb is None else limite_mb
+        self._inicio = time.perf_counter()
+        self._memoria_inicial = _memoria_mb() if self._limite_mb else None
+        self._stream = None
+        if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+            pdf_file = self._stream = io.BufferedReader(_LeitorBuffer(pdf_file))
+        with medir("abertura"):
+            self._pdf = pdfplumber.open(pdf_file)
+            self._num_paginas = len(self._pdf.pages)
+        contar("paginas", self._num_paginas)
+        self._textos = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pdf.close()
+        if self._stream is not None:
+            self._stream.close()
+
+    @property
+    def num_paginas(self):
+        return self._num_paginas
+
+    def texto_pagina(self, indice):
+        """
+        Retorna o texto da página (base 0), extraindo apenas na primeira chamada
+        """
+        texto = self._textos.get(indice)
+        if texto is not None:
+            self._textos.move_to_end(indice)
+            return texto
+
+        # A liberação dos objetos de layout da página também conta como texto
+        with medir("texto"):
+            pagina = self._pdf.pages[indice]
+            try:
+                texto = pagina.extract_text() or ""
+                # Conferido antes de liberar a página, no pico de memória
+                self._verificar_limites()
+            finally:
+                pagina.close()
+        contar("paginas_lidas")
+
+        self._textos[indice] = texto
+        if len(self._textos) > MAX_PAGINAS_MEMORIZADAS:
+            self._textos.popitem(last=False)
+        return texto
+
+    def _verificar_limites(self):
+        decorrido = time.perf_counter() - self._inicio
+        if self._limite_segundos and decorrido > self._limite_segundos:
+            raise LimiteExcedido(f"limite de tempo excedido ({decorrido:.0f}s > {self._limite_segundos:g}s)")
+        if self._memoria_inicial is not None:
+            aumento = _memoria_mb() - self._memoria_inicial
+            if aumento > self._limite_mb:
+                raise LimiteExcedido(f"limite de memória excedido ({aumento:.0f} MB > {self._limite_mb} MB)")
+
+    def paginas(self, indices=None):
+        """
+        Itera sobre o texto das páginas em ordem ou nos índices informados
+        """
+        for indice in range(self.num_paginas) if indices is None else indices:
+            yield self.texto_pagina(indice)
+
+    @property
+    def texto(self):
+        """
+        Texto completo do documento, uma linha em branco ao fim de cada página
+        """
+        return "".join(texto + "\n" for texto in self.paginas())
+
+
+@contextmanager
+def _abrir_documento(pdf_file):
+    """
+    Reaproveita um DocumentoPDF já aberto ou abre o arquivo informado
+    """
+    if isinstance(pdf_file, DocumentoPDF):
+        yield pdf_file
+    else:
+        with DocumentoPDF(pdf_file) as documento:
+            yield documento
+
+
+# Palavras-chave para identificar ENTRADAS
+PALAVRAS_ENTRADAS = [
+    "Total de Entradas",
+    "Relatório de Entradas",
+    "Entradas do Período"
+]
+
+# Palavras-chave que só aparecem em documentos PGDAS
+PALAVRAS_EXCLUSIVAS_PGDAS = [
+    "PGDAS",
+    "Programa Gerador do DAS",
+    "Período de Apuração (PA)",
+    "Receita bruta acumulada nos doze meses anteriores ao PA",
+    "Receita Bruta do PA (RPA) - Competência",
+    "Total Geral da Empresa"
+]
+
+# Tributos do PGDAS, que também aparecem em colunas de relatórios de entradas
+TRIBUTOS_PGDAS = [
+    "IRPJ",
+    "CSLL",
+    "COFINS",
+    "PIS/Pasep",
+    "INSS/CPP",
+    "ICMS",
+    "IPI"
+]
+
+# Palavras-chave para identificar PGDAS
+PALAVRAS_PGDAS = PALAVRAS_EXCLUSIVAS_PGDAS + TRIBUTOS_PGDAS
+
+# Palavras-chave exclusivas de um tipo, sem nenhuma exclusiva do outro, que
+# encerram a leitura antes do fim do documento (todas as de ENTRADAS são exclusivas)
+MIN_PALAVRAS_DECISAO = 2
+
+def _ordem_classificacao(total_paginas):
+    """
+    Primeira e última página (cabeçalho e totais), depois as demais em ordem
+    """
+    if total_paginas <= 2:
+        return list(range(total_paginas))
+    return [0, total_paginas - 1] + list(range(1, total_paginas - 1))
+
+def classificar_documento(pdf_file):
+    """
+    Classifica o documento lendo as páginas sob demanda, a primeira e a última
+    antes das demais, e parando assim que um tipo tem MIN_PALAVRAS_DECISAO
+    palavras-chave exclusivas e o outro nenhuma; sem essa decisão, o documento
+    é lido inteiro e vale o tipo com mais palavras-chave
+    Retorna: (tipo, confiança entre 0 e 1)
+    """
+    exclusivas_pgdas = {palavra.lower() for palavra in PALAVRAS_EXCLUSIVAS_PGDAS}
+    with _abrir_documento(pdf_file) as documento:
+        pendentes_entradas = {palavra.lower() for palavra in PALAVRAS_ENTRADAS}
+        pendentes_pgdas = {palavra.lower() for palavra in PALAVRAS_PGDAS}
+        contador_entradas = 0
+        contador_pgdas = 0
+        contador_exclusivas_pgdas = 0
+        texto_lido = []
+
+        for indice in _ordem_classificacao(documento.num_paginas):
+            texto = documento.texto_pagina(indice)
+            texto_lido.append(texto)
+            texto_lower = texto.lower()
+
+            # Cada palavra-chave conta uma única vez no documento
+            encontradas = {palavra for palavra in pendentes_entradas if palavra in texto_lower}
+            pendentes_entradas -= encontradas
+            contador_entradas += len(encontradas)
+
+            encontradas = {palavra for palavra in pendentes_pgdas if palavra in texto_lower}
+            pendentes_pgdas -= encontradas
+            contador_pgdas += len(encontradas)
+            contador_exclusivas_pgdas += len(encontradas & exclusivas_pgdas)
+
+            if contador_entradas >= MIN_PALAVRAS_DECISAO and contador_exclusivas_pgdas == 0:
+                return "ENTRADAS", 1.0
+            if contador_exclusivas_pgdas >= MIN_PALAVRAS_DECISAO and contador_entradas == 0:
+                return "PGDAS", 1.0
+
+    total = contador_entradas + contador_pgdas
+    confianca = abs(contador_entradas - contador_pgdas) / total if total else 0.0
+
+    # Determinar tipo baseado no maior número de ocorrências
+    if contador_entradas > contador_pgdas and contador_entradas > 0:
+        return "ENTRADAS", confianca
+    elif contador_pgdas > contador_entradas and contador_pgdas > 0:
+        return "PGDAS", confianca
+
+    # Se não conseguir detectar claramente, tentar padrões mais específicos
+    text = "\n".join(texto_lido)
+    if "Total de Entradas:" in text:
+        return "ENTRADAS", confianca
+    elif "PGDAS" in text or "Programa Gerador do DAS" in text:
+        return "PGDAS", confianca
+    return "DESCONHECIDO", 0.0
+
+@medido("classificacao")
+def detectar_tipo_documento(pdf_file):
+    """
+    Detecta automaticamente o tipo de documento baseado no conteúdo do PDF
+    Retorna: 'ENTRADAS', 'PGDAS' ou 'DESCONHECIDO'
+    """
+    try:
+        tipo, _ = classificar_documento(pdf_file)
+        return tipo
+    except LimiteExcedido:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao detectar tipo do documento: {str(e)}")
+        return "DESCONHECIDO"
+
+@medido("extracao")
+def extrair_campos(documento, regras):
+    """
+    Aplica as regras ao documento conforme MODO_EXTRACAO
+    No modo direcionado, as regras do início leem as primeiras páginas e as
+    do fim as últimas, de trás para frente; campos não encontrados caem na
+    leitura sequencial, que reaproveita o texto das páginas já lidas
+    """
+    total_paginas = documento.num_paginas
+    if MODO_EXTRACAO == "completo" or total_paginas <= PAGINAS_INICIO + PAGINAS_FIM:
+        return aplicar_regras(documento.paginas(), regras)
+
+    resultado = aplicar_regras(
+        documento.paginas(range(PAGINAS_INICIO)),
+        [regra for regra in regras if regra.posicao != "fim"]
+    )
+    resultado.update(aplicar_regras(
+        documento.paginas(range(total_paginas - 1, total_paginas - 1 - PAGINAS_FIM, -1)),
+        [regra for regra in regras if regra.posicao == "fim"]
+    ))
+
+    pendentes = [regra for regra in regras if regra.campo not in resultado]
+    if pendentes:
+        contar("fallbacks")
+        resultado.update(aplicar_regras(documento.paginas(), pendentes))
+    return resultado
+
+def extrair_dados_entradas(pdf_file):
+    """
+    Extrai dados do PDF de relatórios de entradas
+    """
+    data = {
+        "Empresa": None,
+        "CNPJ": None,
+        "Período": None,
+        "Total de Entradas": None,
+        "Tipo_Documento": "ENTRADAS"
+    }
+
+    with _abrir_documento(pdf_file) as documento:
+        data.update(extrair_campos(documento, REGRAS_ENTRADAS))
+
+    return data
+
+@medido("extracao")
+def extrair_dados_pgdas(pdf_path):
+    """
+    Extrai dados do PDF do PGDAS
+    """
+    dados_por_arquivo = {
+        'CNPJ': None,
+        'Empresa': "Não encontrado",
+        'Período de Apuração': "Não encontrado",
+        'RBT12': "Não encontrado",
+        'Receita Bruta Informada': "Não encontrado",
+        'Total do Débito Declarado': "Não encontrado",
+        'Tipo_Documento': "PGDAS"
+    }
+
+    try:
+        # Só as páginas onde os campos costumam estar são lidas
+        with _abrir_documento(pdf_path) as documento:
+            dados_por_arquivo.update(extrair_campos(documento, REGRAS_PGDAS))
+
+    except LimiteExcedido:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao processar o PDF: {str(e)}")
+        return []
+
+    return [dados_por_arquivo] if any(valor != "Não encontrado" for valor in dados_por_arquivo.values()) else []
+
+def processar_documento(pdf_file, limite_mb=None):
+    """
+    Abre o PDF uma única vez, detecta o tipo e extrai os registros
+    limite_mb: aumento de memória tolerado (padrão LIMITE_MB_ARQUIVO, 0 desativa)
+    Retorna: (tipo_detectado, lista de registros com Empresa preenchida)
+    """
+    with DocumentoPDF(pdf_file, limite_mb=limite_mb) as documento:
+        tipo_detectado = detectar_tipo_documento(documento)
+
+        # Fallback para PGDAS se não identificado
+        tipo_processado = "PGDAS" if tipo_detectado == "DESCONHECIDO" else tipo_detectado
+
+        if tipo_processado == "ENTRADAS":
+            registros = [extrair_dados_entradas(documento)]
+        else:
+            registros = extrair_dados_pgdas(documento)
+
+    return tipo_detectado, [dado for dado in registros if dado and dado["Empresa"]]
@@ -0,0 +1,204 @@
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+
+# Etapas do pipeline, na ordem em que ocorrem
+ETAPAS = ["hash", "abertura", "texto", "classificacao", "extracao", "consolidacao", "exportacao"]
+
+# Quantis do tempo por arquivo na saída Prometheus
+QUANTIS = [0.5, 0.9, 0.99]
+
+_local = threading.local()
+
+
+class ColetorMetricas:
+    """
+    Tempos por etapa e contadores (páginas, bytes...) de um arquivo ou lote
+    Os tempos são exclusivos: o tempo de uma etapa aninhada em outra é
+    descontado da etapa de fora, de modo que a soma das etapas é o tempo total
+    """
+
+    def __init__(self, etapas=None, contadores=None):
+        self.etapas = dict(etapas or {})
+        self.contadores = dict(contadores or {})
+        self._pilha = []
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.perf_counter()
+        self._pilha.append(0.0)
+        try:
+            yield
+        finally:
+            aninhado = self._pilha.pop()
+            duracao = time.perf_counter() - inicio
+            self.etapas[etapa] = self.etapas.get(etapa, 0.0) + duracao - aninhado
+            if self._pilha:
+                self._pilha[-1] += duracao
+
+    def contar(self, nome, valor=1):
+        self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    def como_dict(self):
+        return {"etapas": dict(self.etapas), "contadores": dict(self.contadores)}
+
+
+def coletor_ativo():
+    return getattr(_local, "coletor", None)
+
+
+@contextmanager
+def coletar(coletor=None):
+    """
+    Ativa um coletor na thread atual; medir e contar passam a registrar nele
+    """
+    coletor = coletor if coletor is not None else ColetorMetricas()
+    anterior = coletor_ativo()
+    _local.coletor = coletor
+    try:
+        yield coletor
+    finally:
+        _local.coletor = anterior
+
+
+def medir(etapa):
+    """
+    Mede a etapa no coletor ativo; sem coletor ativo não faz nada
+    """
+    coletor = coletor_ativo()
+    return coletor.medir(etapa) if coletor is not None else nullcontext()
+
+
+def contar(nome, valor=1):
+    coletor = coletor_ativo()
+    if coletor is not None:
+        coletor.contar(nome, valor)
+
+
+def medido(etapa):
+    """
+    Decorador: mede cada chamada da função como a etapa informada
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def _quantil(valores_ordenados, quantil):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(quantil * len(valores_ordenados)))
+    return valores_ordenados[indice]
+
+
+def _origem(arquivo):
+    if arquivo.get("duplicata"):
+        return "duplicata"
+    return "cache" if arquivo["cache"] else "extracao"
+
+
+class MetricasLote:
+    """
+    Métricas de um lote: cada arquivo com suas etapas e contadores, e as
+    etapas do lote como um todo (consolidação e exportação) em `coletor`
+    """
+
+    def __init__(self):
+        self.arquivos = []
+        self.coletor = ColetorMetricas()
+
+    def registrar(self, resultado):
+        """
+        Acrescenta as métricas de um ResultadoArquivo
+        """
+        metricas = resultado.metricas or {}
+        self.arquivos.append({
+            "nome": resultado.nome,
+            "tipo": resultado.tipo_detectado,
+            "cache": bool(metricas.get("cache")),
+            "duplicata": resultado.duplicata,
+            "erro": resultado.erro,
+            "duracao": resultado.duracao,
+            "etapas": dict(metricas.get("etapas", {})),
+            "contadores": dict(metricas.get("contadores", {})),
+        })
+
+    @property
+    def extraidos(self):
+        """
+        Arquivos efetivamente extraídos, sem contar os servidos pelo cache
+        nem as cópias de outros arquivos do lote
+        """
+        return sum(1 for arquivo in self.arquivos if not arquivo["cache"])
+
+    def totais_etapas(self):
+        totais = dict.fromkeys(ETAPAS, 0.0)
+        for etapas in [arquivo["etapas"] for arquivo in self.arquivos] + [self.coletor.etapas]:
+            for etapa, duracao in etapas.items():
+                totais[etapa] = totais.get(etapa, 0.0) + duracao
+        return totais
+
+    def totais_contadores(self):
+        totais = {}
+        for arquivo in self.arquivos:
+            for nome, valor in arquivo["contadores"].items():
+                totais[nome] = totais.get(nome, 0) + valor
+        return totais
+
+    def como_dict(self):
+        return {
+            "arquivos": self.arquivos,
+            "etapas": self.totais_etapas(),
+            "contadores": self.totais_contadores(),
+        }
+
+    def para_json(self):
+        return json.dumps(self.como_dict(), ensure_ascii=False, indent=2)
+
+    def para_prometheus(self, prefixo="extracao"):
+        """
+        Métricas agregadas no formato texto do Prometheus
+        Arquivos individuais ficam só no JSON, para não multiplicar séries
+        """
+        linhas = [
+            f"# HELP {prefixo}_etapa_segundos_total Tempo gasto em cada etapa do pipeline",
+            f"# TYPE {prefixo}_etapa_segundos_total counter",
+        ]
+        for etapa, duracao in self.totais_etapas().items():
+            linhas.append(f'{prefixo}_etapa_segundos_total{{etapa="{etapa}"}} {duracao:.6f}')
+
+        linhas += [
+            f"# HELP {prefixo}_arquivos_total Arquivos processados por tipo e origem",
+            f"# TYPE {prefixo}_arquivos_total counter",
+        ]
+        contagem = {}
+        for arquivo in self.arquivos:
+            tipo = "ERRO" if arquivo["erro"] else arquivo["tipo"]
+            origem = _origem(arquivo)
+            contagem[(tipo, origem)] = contagem.get((tipo, origem), 0) + 1
+        for (tipo, origem), quantidade in sorted(contagem.items()):
+            linhas.append(f'{prefixo}_arquivos_total{{tipo="{tipo}",origem="{origem}"}} {quantidade}')
+
+        for nome, valor in sorted(self.totais_contadores().items()):
+            linhas += [f"# TYPE {prefixo}_{nome}_total counter", f"{prefixo}_{nome}_total {valor}"]
+
+        # Tempo por arquivo extraído (cache e erros distorceriam os quantis)
+        duracoes = sorted(
+            arquivo["duracao"] for arquivo in self.arquivos if not arquivo["cache"] and not arquivo["erro"]
+        )
+        linhas += [
+            f"# HELP {prefixo}_arquivo_segundos Tempo de extração por arquivo",
+            f"# TYPE {prefixo}_arquivo_segundos summary",
+        ]
+        for quantil in QUANTIS:
+            linhas.append(f'{prefixo}_arquivo_segundos{{quantile="{quantil}"}} {_quantil(duracoes, quantil):.6f}')
+        linhas.append(f"{prefixo}_arquivo_segundos_sum {sum(duracoes):.6f}")
+        linhas.append(f"{prefixo}_arquivo_segundos_count {len(duracoes)}")
+
+        return "\n".join(linhas) + "\n"
@@ -0,0 +1,340 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from extracao import (
+    processar_documento, assinatura_documento, LimiteExcedido, LIMITE_SEGUNDOS_ARQUIVO, LIMITE_MB_ARQUIVO
+)
+from cache_extracao import calcular_hash
+from metricas import ColetorMetricas, coletar
+
+logger = logging.getLogger(__name__)
+
+# Número de processos de extração; padrão é um por núcleo
+NUM_WORKERS = int(os.environ.get("EXTRACAO_WORKERS", 0)) or os.cpu_count() or 1
+
+# Arquivos em memória acima deste tamanho são gravados em um diretório temporário
+LIMITE_MEMORIA_MB = int(os.environ.get("EXTRACAO_LIMITE_MEMORIA_MB", 50))
+
+# Sobe os processos de extração antes do primeiro lote (ver preaquecer)
+PREAQUECER = os.environ.get("EXTRACAO_PREAQUECER", "").strip().lower() in ("1", "true", "yes", "sim")
+
+
+# Resultado de um arquivo; hash é o SHA-256 do conteúdo e duração está em segundos
+# metricas: tempos por etapa e contadores (ColetorMetricas.como_dict), com
+# "cache": True quando o resultado veio do cache de extração
+# quarentena: o arquivo excedeu os limites de tempo ou memória da extração
+# duplicata: nome do arquivo do mesmo lote de que este é cópia; cópias não
+# são extraídas e voltam sem registros, para não serem somadas duas vezes
+# posicao: índice do arquivo na lista recebida (a ordem de envio), já que os
+# resultados são gerados na ordem em que terminam
+ResultadoArquivo = namedtuple(
+    "ResultadoArquivo",
+    ["nome", "tipo_detectado", "registros", "erro", "duracao", "hash", "metricas", "quarentena", "duplicata", "posicao"],
+    defaults=[None, False, None, None]
+)
+
+# Limites em vigor, registrados junto com a quarentena
+LIMITES_ARQUIVO = (LIMITE_SEGUNDOS_ARQUIVO, LIMITE_MB_ARQUIVO)
+
+# Pools de processos por número de workers, mantidos entre lotes e sessões
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def _carregar_modulos():
+    """
+    Importa os módulos pesados da extração; inicializador dos processos do pool
+    """
+    import pdfplumber  # noqa: F401
+
+
+def _aquecido():
+    """
+    Tarefa vazia usada para subir os processos do pool
+    """
+    return os.getpid()
+
+
+def _obter_pool(workers):
+    """
+    Pool compartilhado com até `workers` processos, criado na primeira chamada
+    Com spawn, os processos só sobem quando há arquivos para eles
+    """
+    with _lock_pools:
+        pool = _pools.get(workers)
+        if pool is None:
+            # spawn evita herdar threads do servidor Streamlit no fork
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_carregar_modulos
+            )
+        return pool
+
+
+def _descartar_pool(workers, pool):
+    """
+    Remove um pool quebrado (processo morto pelo sistema); o próximo lote cria outro
+    """
+    with _lock_pools:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False)
+
+
+def _usa_pool(workers, arquivos):
+    """
+    Se a extração roda no pool de processos: com mais de um processo e de um
+    arquivo, ou sempre que houver limite de memória, que só pode ser medido
+    em um processo dedicado à extração
+    """
+    return LIMITE_MB_ARQUIVO > 0 or (workers > 1 and arquivos > 1)
+
+
+def preaquecer(max_workers=None):
+    """
+    Carrega em segundo plano os módulos da extração no próprio processo (hash
+    e assinatura dos arquivos) e sobe os processos do pool já com eles
+    importados, para que o primeiro lote não espere por isso
+    Retorna: futuros das tarefas de aquecimento, sem aguardá-los
+    """
+    threading.Thread(target=_carregar_modulos, name="preaquecer-extracao", daemon=True).start()
+    workers = max_workers or NUM_WORKERS
+    if LIMITE_MB_ARQUIVO <= 0 and workers <= 1:
+        # Todos os lotes rodam no próprio processo
+        return []
+    pool = _obter_pool(workers)
+    # Enviadas juntas, sem processo ocioso: cada tarefa sobe um processo
+    return [pool.submit(_aquecido) for _ in range(workers)]
+
+
+def _processar_arquivo(nome, pdf_file, hash_arquivo=None, metricas=None, isolado=False):
+    """
+    Processa um único arquivo isolando qualquer erro
+    metricas: medições já feitas no processo principal (hash, bytes)
+    isolado: True nos processos do pool. No próprio processo, usado só com o
+    limite de memória desativado, um limite de tempo excedido vira erro comum,
+    sem quarentena gravada, para o arquivo ser tentado de novo
+    """
+    inicio = time.perf_counter()
+    quarentena = False
+    with coletar(ColetorMetricas(**(metricas or {}))) as coletor:
+        try:
+            tipo_detectado, registros = processar_documento(pdf_file, limite_mb=None if isolado else 0)
+            erro = None
+        except LimiteExcedido as e:
+            logger.warning(f"Arquivo {nome} {'colocado em quarentena' if isolado else 'interrompido'}: {str(e)}")
+            tipo_detectado, registros, erro, quarentena = "DESCONHECIDO", [], str(e), isolado
+        except Exception as e:
+            logger.error(f"Erro ao processar {nome}: {str(e)}")
+            tipo_detectado, registros, erro = "DESCONHECIDO", [], str(e)
+    return ResultadoArquivo(
+        nome, tipo_detectado, registros, erro, time.perf_counter() - inicio, hash_arquivo,
+        coletor.como_dict(), quarentena
+    )
+
+
+def processar_arquivos(arquivos, max_workers=None, cache=None):
+    """
+    Detecta e extrai os PDFs em paralelo, um processo por núcleo
+    arquivos: lista de (nome, caminho ou conteúdo do PDF em bytes/memoryview)
+    cache: CacheExtracao opcional; arquivos já extraídos não são relidos
+    Gera um ResultadoArquivo conforme cada arquivo termina
+
+    Arquivos repetidos no lote, com o mesmo hash ou a mesma assinatura de
+    conteúdo (assinatura_documento), são extraídos uma vez só; as cópias
+    são geradas logo depois do original, marcadas em `duplicata`
+    """
+    pendentes = []
+    # hash ou assinatura -> hash do primeiro arquivo do lote que os tem
+    originais = {}
+    # hash do original -> resultado já gerado, ou cópias à espera dele
+    concluidos = {}
+    aguardando = {}
+    # hash dos arquivos a extrair -> posição na lista recebida
+    posicoes = {}
+
+    def copia(nome, hash_arquivo, metricas, hash_original, posicao):
+        if hash_original in concluidos:
+            return [_duplicata(nome, hash_arquivo, metricas, concluidos[hash_original], cache, posicao)]
+        aguardando.setdefault(hash_original, []).append((nome, hash_arquivo, metricas, posicao))
+        return []
+
+    def concluir(resultado):
+        concluidos[resultado.hash] = resultado
+        return [resultado] + [
+            _duplicata(nome, hash_arquivo, metricas, resultado, cache, posicao)
+            for nome, hash_arquivo, metricas, posicao in aguardando.pop(resultado.hash, [])
+        ]
+
+    for posicao, (nome, pdf_file) in enumerate(arquivos):
+        coletor = ColetorMetricas()
+        try:
+            with coletor.medir("hash"):
+                hash_arquivo = calcular_hash(pdf_file)
+                tamanho = _tamanho(pdf_file)
+                if tamanho is None and isinstance(pdf_file, (str, os.PathLike)):
+                    tamanho = os.path.getsize(pdf_file)
+        except OSError as e:
+            logger.error(f"Erro ao ler {nome}: {str(e)}")
+            yield ResultadoArquivo(nome, "DESCONHECIDO", [], str(e), 0.0, None, coletor.como_dict(), posicao=posicao)
+            continue
+        if tamanho is not None:
+            coletor.contar("bytes", tamanho)
+        if hash_arquivo in originais:
+            yield from copia(nome, hash_arquivo, coletor.como_dict(), originais[hash_arquivo], posicao)
+            continue
+        if cache is not None:
+            chave = cache.chave(hash_arquivo)
+            resultado = cache.obter(chave)
+            if resultado is not None:
+                tipo_detectado, registros = resultado
+                metricas = {**coletor.como_dict(), "cache": True}
+                originais[hash_arquivo] = hash_arquivo
+                yield from concluir(ResultadoArquivo(
+                    nome, tipo_detectado, registros, None, 0.0, hash_arquivo, metricas, posicao=posicao
+                ))
+                continue
+            # Arquivos que já excederam os limites não são tentados de novo
+            motivo = cache.motivo_quarentena(chave, LIMITES_ARQUIVO)
+            if motivo is not None:
+                metricas = {**coletor.como_dict(), "cache": True}
+                originais[hash_arquivo] = hash_arquivo
+                yield from concluir(ResultadoArquivo(
+                    nome, "DESCONHECIDO", [], f"em quarentena: {motivo}", 0.0, hash_arquivo, metricas, True,
+                    posicao=posicao
+                ))
+                continue
+
+        # Só arquivos que seriam extraídos pagam pela assinatura; a importação
+        # do pdfminer, na primeira delas, fica fora da medição
+        _carregar_modulos()
+        with coletor.medir("hash"):
+            assinatura = assinatura_documento(pdf_file)
+        if assinatura in originais:
+            yield from copia(nome, hash_arquivo, coletor.como_dict(), originais[assinatura], posicao)
+            continue
+        originais[hash_arquivo] = hash_arquivo
+        if assinatura is not None:
+            originais[assinatura] = hash_arquivo
+        posicoes[hash_arquivo] = posicao
+        pendentes.append((nome, pdf_file, hash_arquivo, coletor.como_dict()))
+
+    for resultado in _extrair_pendentes(pendentes, max_workers):
+        resultado = resultado._replace(posicao=posicoes[resultado.hash])
+        # Erros não são guardados para que o arquivo seja tentado novamente,
+        # exceto os de limite excedido, que ficam em quarentena
+        if cache is not None and resultado.quarentena:
+            cache.colocar_em_quarentena(cache.chave(resultado.hash), resultado.erro, LIMITES_ARQUIVO)
+        elif cache is not None and not resultado.erro:
+            cache.guardar(cache.chave(resultado.hash), (resultado.tipo_detectado, resultado.registros))
+        yield from concluir(resultado)
+
+
+def _duplicata(nome, hash_arquivo, metricas, original, cache, posicao=None):
+    """
+    Resultado de uma cópia de outro arquivo do lote: mesmo tipo, sem registros
+    Cópias com bytes diferentes também entram no cache com os registros do
+    original, de modo que enviadas sozinhas depois não precisam ser extraídas
+    """
+    if cache is not None and hash_arquivo != original.hash and not original.erro:
+        cache.guardar(cache.chave(hash_arquivo), (original.tipo_detectado, original.registros))
+    return ResultadoArquivo(
+        nome, original.tipo_detectado, [], original.erro, 0.0, hash_arquivo,
+        {**metricas, "cache": True}, original.quarentena, original.nome, posicao
+    )
+
+
+def _tamanho(pdf_file):
+    """
+    Tamanho em bytes do conteúdo em memória; None para caminhos
+    """
+    if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+        return memoryview(pdf_file).nbytes
+    return None
+
+
+def _extrair_pendentes(arquivos, max_workers):
+    """
+    Extrai os arquivos no pool de processos, ou no próprio processo quando não
+    há ganho com paralelismo nem limite de memória a aplicar
+    """
+    workers = max_workers or NUM_WORKERS
+    isolar = _usa_pool(workers, len(arquivos))
+    limite_bytes = LIMITE_MEMORIA_MB * 1024 * 1024
+    diretorio = None
+
+    try:
+        preparados = []
+        for nome, pdf_file, hash_arquivo, metricas in arquivos:
+            tamanho = _tamanho(pdf_file)
+            if tamanho is not None and tamanho > limite_bytes:
+                # Diretório exclusivo da chamada: sessões concorrentes não colidem
+                if diretorio is None:
+                    diretorio = tempfile.mkdtemp(prefix="extracao_")
+                caminho = os.path.join(diretorio, f"{len(preparados)}.pdf")
+                with open(caminho, "wb") as f:
+                    f.write(pdf_file)
+                pdf_file = caminho
+            elif isolar and isinstance(pdf_file, memoryview):
+                # memoryview não é serializável para os processos
+                pdf_file = pdf_file.tobytes()
+            preparados.append((nome, pdf_file, hash_arquivo, metricas))
+
+        if isolar:
+            yield from _executar(preparados, workers)
+        else:
+            # Sem ganho com paralelismo nem limite de memória: evita o custo de usar processos
+            for arquivo in preparados:
+                yield _processar_arquivo(*arquivo)
+
+    finally:
+        if diretorio is not None:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def _submeter(workers, arquivos):
+    """
+    Envia os arquivos ao pool compartilhado, trocando-o se estiver quebrado
+    Retorna: (pool, {futuro: arquivo})
+    """
+    pool = _obter_pool(workers)
+    try:
+        return pool, {pool.submit(_processar_arquivo, *arquivo, True): arquivo for arquivo in arquivos}
+    except BrokenProcessPool:
+        _descartar_pool(workers, pool)
+        pool = _obter_pool(workers)
+        return pool, {pool.submit(_processar_arquivo, *arquivo, True): arquivo for arquivo in arquivos}
+
+
+def _executar(arquivos, workers):
+    """
+    Executa a extração no pool de processos compartilhado; os processos
+    continuam ativos ao fim do lote e atendem os lotes seguintes
+    """
+    pool, futuros = _submeter(workers, arquivos)
+    try:
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except BrokenProcessPool as e:
+                # Processo morto pelo sistema (ex.: falta de memória): os
+                # arquivos restantes viram erro em vez de derrubar o lote
+                nome, _, hash_arquivo, metricas = futuros[futuro]
+                logger.error(f"Processo de extração interrompido em {nome}: {str(e)}")
+                _descartar_pool(workers, pool)
+                resultado = ResultadoArquivo(
+                    nome, "DESCONHECIDO", [], f"processo de extração interrompido: {str(e)}", 0.0,
+                    hash_arquivo, metricas
+                )
+            yield resultado
+    finally:
+        # Rerun interrompido ou tarefa cancelada: descarta o que ainda não começou
+        for futuro in futuros:
+            futuro.cancel()
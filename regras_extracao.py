@@ -0,0 +1,233 @@
+import re
+
+# Valores numéricos no formato brasileiro (ex: 1.234,56)
+PADRAO_VALOR = re.compile(r'([\d.,]+)')
+
+
+class RegraExtracao:
+    """
+    Regra declarativa para extrair um campo a partir das linhas de uma página
+
+    Uma linha é âncora quando contém todos os textos de `ancoras`. O `padrao`
+    é procurado nas linhas da `janela` (posições relativas à âncora): linha a
+    linha, aceitando a primeira com pelo menos `minimo` ocorrências e ficando
+    com a de índice `ocorrencia`; ou, com `juntar`, no texto das linhas unidas.
+    `antes` exige que alguma das `distancia_antes` linhas anteriores contenha
+    todos os textos informados. Para o mesmo campo, vence a regra de menor
+    `prioridade` na página e, entre iguais, a primeira linha encontrada.
+    `posicao` indica onde o campo costuma estar no documento ("inicio" ou
+    "fim"), usada pela extração direcionada para escolher as páginas lidas.
+    """
+
+    __slots__ = ("campo", "ancoras", "padrao", "janela", "juntar", "ocorrencia", "minimo",
+                 "antes", "distancia_antes", "prioridade", "ignorar_caixa", "conversor", "posicao")
+
+    def __init__(self, campo, ancoras, padrao=PADRAO_VALOR, janela=(0, 0), juntar=False,
+                 ocorrencia=0, minimo=1, antes=(), distancia_antes=1, prioridade=0,
+                 ignorar_caixa=False, conversor=None, posicao="inicio"):
+        self.campo = campo
+        self.posicao = posicao
+        self.ignorar_caixa = ignorar_caixa
+        self.ancoras = tuple(ancora.lower() if ignorar_caixa else ancora for ancora in ancoras)
+        self.padrao = padrao
+        self.janela = janela
+        self.juntar = juntar
+        self.ocorrencia = ocorrencia
+        self.minimo = minimo
+        self.antes = tuple(antes)
+        self.distancia_antes = distancia_antes
+        self.prioridade = prioridade
+        self.conversor = conversor
+
+    def avaliar(self, lines, i):
+        """
+        Aplica a regra à âncora na linha i; retorna o valor ou None
+        """
+        if self.antes and not any(
+            all(texto in lines[k] for texto in self.antes)
+            for k in range(max(0, i - self.distancia_antes), i)
+        ):
+            return None
+
+        inicio = max(0, i + self.janela[0])
+        fim = min(len(lines), i + self.janela[1] + 1)
+
+        valor = None
+        if self.juntar:
+            match = self.padrao.search("\n".join(lines[inicio:fim]))
+            if match:
+                valor = match.group(1)
+        else:
+            for line in lines[inicio:fim]:
+                encontrados = self.padrao.findall(line)
+                if len(encontrados) >= self.minimo:
+                    valor = encontrados[self.ocorrencia]
+                    break
+
+        if valor is not None and self.conversor:
+            valor = self.conversor(valor)
+        return valor
+
+
+def aplicar_regras(paginas, regras):
+    """
+    Avalia todas as regras pendentes em uma única passada pelas linhas de cada
+    página e para de ler páginas assim que todos os campos forem encontrados
+    paginas: iterável (preguiçoso) com o texto de cada página
+    Retorna: dict campo -> valor apenas com os campos encontrados
+    """
+    resultado = {}
+    campos = {regra.campo for regra in regras}
+    prioridade_minima = {}
+    for regra in regras:
+        prioridade_minima[regra.campo] = min(regra.prioridade, prioridade_minima.get(regra.campo, regra.prioridade))
+
+    for texto in paginas:
+        if not texto:
+            continue
+
+        lines = texto.split('\n')
+        pendentes = [regra for regra in regras if regra.campo not in resultado]
+        melhores = {}
+
+        for i, line in enumerate(lines):
+            line_lower = None
+            for regra in pendentes:
+                melhor = melhores.get(regra.campo)
+                if melhor is not None and melhor[0] <= regra.prioridade:
+                    continue
+
+                if regra.ignorar_caixa:
+                    if line_lower is None:
+                        line_lower = line.lower()
+                    alvo = line_lower
+                else:
+                    alvo = line
+                if not all(ancora in alvo for ancora in regra.ancoras):
+                    continue
+
+                valor = regra.avaliar(lines, i)
+                if valor is not None:
+                    melhores[regra.campo] = (regra.prioridade, valor)
+
+            # Todos os campos pendentes já têm o melhor resultado possível
+            if len(melhores) == len(campos) - len(resultado) and all(
+                prioridade == prioridade_minima[campo] for campo, (prioridade, _) in melhores.items()
+            ):
+                break
+
+        resultado.update((campo, valor) for campo, (_, valor) in melhores.items())
+        if len(resultado) == len(campos):
+            break
+
+    return resultado
+
+
+def _periodo_mes_ano(periodo_completo):
+    """
+    Simplifica "01/03/2024 até 31/03/2024" para "03/2024"
+    """
+    mes_ano_match = re.search(r"(\d{2})/(\d{4})", periodo_completo)
+    if mes_ano_match:
+        return f"{mes_ano_match.group(1)}/{mes_ano_match.group(2)}"
+    return None
+
+
+def _valor_brasileiro(valor):
+    return float(valor.replace(".", "").replace(",", "."))
+
+
+REGRAS_PGDAS = [
+    RegraExtracao(
+        "RBT12",
+        ["Receita bruta acumulada nos doze meses anteriores ao PA"],
+        janela=(1, 1)
+    ),
+    RegraExtracao(
+        "Período de Apuração",
+        ["período de apuração (pa)"],
+        padrao=re.compile(r'Período de Apuração \(PA\)[:\s]*(\d{2}/\d{4})', re.IGNORECASE),
+        janela=(0, 1),
+        juntar=True,
+        ignorar_caixa=True
+    ),
+    RegraExtracao(
+        "Receita Bruta Informada",
+        ["Receita Bruta do PA (RPA) - Competência"]
+    ),
+    RegraExtracao(
+        "Empresa",
+        ["nome empresarial"],
+        padrao=re.compile(r'Nome Empresarial[:\s]*([^,\n]+)', re.IGNORECASE),
+        janela=(0, 1),
+        juntar=True,
+        ignorar_caixa=True,
+        conversor=str.strip
+    ),
+    # Total do Débito Declarado: cabeçalho de tributos logo após "Total Geral da Empresa"
+    RegraExtracao(
+        "Total do Débito Declarado",
+        ["IRPJ", "CSLL", "COFINS", "Total"],
+        janela=(1, 1),
+        ocorrencia=-1,
+        antes=["Total Geral da Empresa"],
+        distancia_antes=4,
+        posicao="fim"
+    ),
+    # Alternativa: linha com os valores de todos os tributos abaixo do cabeçalho
+    RegraExtracao(
+        "Total do Débito Declarado",
+        [],
+        ocorrencia=-1,
+        minimo=8,
+        antes=["IRPJ", "CSLL", "COFINS"],
+        prioridade=1,
+        posicao="fim"
+    ),
+    # Alternativa: valores logo após "Total do Débito Declarado (exigível + suspenso)"
+    RegraExtracao(
+        "Total do Débito Declarado",
+        ["Total do Débito Declarado", "(exigível + suspenso)"],
+        janela=(1, 3),
+        ocorrencia=-1,
+        minimo=8,
+        prioridade=2,
+        posicao="fim"
+    ),
+]
+
+REGRAS_ENTRADAS = [
+    RegraExtracao(
+        "Empresa",
+        ["LTDA"],
+        padrao=re.compile(r"([A-Z\s&]+LTDA)"),
+        janela=(-1, 0),
+        juntar=True,
+        conversor=str.strip
+    ),
+    RegraExtracao(
+        "CNPJ",
+        ["CNPJ:"],
+        padrao=re.compile(r"CNPJ:\s*([\d./-]+)"),
+        janela=(0, 1),
+        juntar=True,
+        conversor=str.strip
+    ),
+    RegraExtracao(
+        "Período",
+        ["Período:"],
+        padrao=re.compile(r"Período:\s*([\d/]+ até [\d/]+)"),
+        janela=(0, 1),
+        juntar=True,
+        conversor=_periodo_mes_ano
+    ),
+    RegraExtracao(
+        "Total de Entradas",
+        ["Total de Entradas:"],
+        padrao=re.compile(r"Total de Entradas:\s*([\d.,]+)"),
+        janela=(0, 1),
+        juntar=True,
+        conversor=_valor_brasileiro,
+        posicao="fim"
+    ),
+]
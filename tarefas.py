@@ -0,0 +1,261 @@
+import logging
+import threading
+
+from processamento import processar_arquivos
+from consolidacao import ConsolidacaoIncremental, DetectorDuplicatas, normalizar_nome_empresa
+from metricas import MetricasLote
+
+logger = logging.getLogger(__name__)
+
+# Estados de uma tarefa
+EXECUTANDO = "executando"
+CONCLUIDA = "concluída"
+CANCELADA = "cancelada"
+FALHOU = "falhou"
+
+
+class TarefaExtracao:
+    """
+    Lote de extração executado em segundo plano, em uma thread própria
+
+    A thread extrai os arquivos, grava os novos no banco local e acumula a
+    consolidação conforme cada arquivo termina; a interface consulta o
+    progresso e os resultados parciais a cada rerun, sem ficar bloqueada.
+    Todo o estado compartilhado é protegido por `_lock`.
+    """
+
+    def __init__(self, arquivos, cache=None, armazenamento=None, max_workers=None):
+        """
+        arquivos: lista de (nome, caminho ou conteúdo do PDF), como em processar_arquivos
+        """
+        self.total = len(arquivos)
+        self.lote = MetricasLote()
+        self.estado = EXECUTANDO
+        self._arquivos = arquivos
+        self._cache = cache
+        self._armazenamento = armazenamento
+        self._max_workers = max_workers
+        self._processados = 0
+        self._registros = 0
+        self._tipos_detectados = {}
+        self._dados_por_empresa = {}
+        # (posição no lote, registros que valem) de cada arquivo consolidado
+        self._aceitos = []
+        self._mensagens = []
+        self._consolidacao = ConsolidacaoIncremental()
+        self._duplicatas = DetectorDuplicatas()
+        self._consolidados = None
+        # Incrementada a cada mudança na consolidação
+        self._versao = 0
+        self._cancelar = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._executar, name="tarefa-extracao", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def cancelar(self):
+        """
+        Pede o cancelamento; os arquivos já processados continuam disponíveis
+        e os que ainda não começaram são descartados
+        """
+        self._cancelar.set()
+
+    def aguardar(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    @property
+    def em_execucao(self):
+        return self.estado == EXECUTANDO
+
+    def _executar(self):
+        resultados = processar_arquivos(self._arquivos, max_workers=self._max_workers, cache=self._cache)
+        try:
+            for resultado in resultados:
+                registros = self._registrar(resultado)
+                if registros is not None:
+                    self._armazenar(resultado, registros)
+                if self._cancelar.is_set():
+                    break
+        except Exception as e:
+            logger.error(f"Erro no processamento em segundo plano: {str(e)}")
+            with self._lock:
+                self._mensagens.append(("erro", f"Processamento interrompido: {str(e)}"))
+            estado = FALHOU
+        else:
+            estado = CANCELADA if self._cancelar.is_set() else CONCLUIDA
+        finally:
+            # Fecha o gerador: processos e arquivos temporários são liberados
+            resultados.close()
+            self._arquivos = None
+
+        with self._lock:
+            with self.lote.coletor.medir("consolidacao"):
+                self._consolidados = self._consolidacao.dados_consolidados()
+            self.estado = estado
+
+    def _registrar(self, resultado):
+        """
+        Acumula o resultado de um arquivo na consolidação
+        Retorna: registros a gravar no banco local, ou None se o arquivo não
+        deve ser gravado
+        """
+        with self._lock:
+            self._processados += 1
+            self.lote.registrar(resultado)
+
+            if resultado.quarentena:
+                self._mensagens.append((
+                    "aviso",
+                    f"⚠️ Arquivo {resultado.nome} ignorado ({resultado.erro}). Ajuste EXTRACAO_LIMITE_SEGUNDOS ou EXTRACAO_LIMITE_ARQUIVO_MB para tentar novamente."
+                ))
+                return None
+            if resultado.duplicata:
+                self._mensagens.append((
+                    "aviso",
+                    f"📑 Arquivo {resultado.nome} é cópia de {resultado.duplicata} e não foi processado nem somado de novo."
+                ))
+                return None
+            if resultado.erro:
+                self._mensagens.append(("erro", f"Erro ao processar arquivo {resultado.nome}: {resultado.erro}"))
+                return None
+
+            self._tipos_detectados[resultado.nome] = resultado.tipo_detectado
+            with self.lote.coletor.medir("consolidacao"):
+                registros, substituidos, prevalecentes = self._duplicatas.separar(
+                    resultado.nome, resultado.posicao, resultado.registros
+                )
+                if substituidos:
+                    self._mensagens.append((
+                        "aviso",
+                        f"📑 Arquivo {resultado.nome} tem o mesmo CNPJ, período e tipo de {', '.join(substituidos)}, "
+                        f"enviado antes; valem os registros de {resultado.nome}."
+                    ))
+                if prevalecentes:
+                    self._mensagens.append((
+                        "aviso",
+                        f"📑 Arquivo {resultado.nome} tem o mesmo CNPJ, período e tipo de {', '.join(prevalecentes)}, "
+                        f"enviado depois; os registros repetidos de {resultado.nome} não foram somados à consolidação nem gravados no banco."
+                    ))
+                self._aceitos.append((resultado.posicao, list(registros)))
+                if substituidos:
+                    # Registros já somados deixaram de valer: a consolidação é refeita
+                    self._reconstruir()
+                else:
+                    for dado in registros:
+                        self._adicionar(dado)
+                self._versao += 1
+            # Arquivos substituídos por inteiro ficam fora do banco
+            if resultado.registros and not registros:
+                return None
+            return registros
+
+    def _adicionar(self, dado):
+        self._registros += 1
+        _agrupar_por_empresa(self._dados_por_empresa, dado)
+        self._consolidacao.adicionar(dado)
+
+    def _reconstruir(self):
+        """
+        Refaz a consolidação e o agrupamento por empresa só com os registros
+        que ainda valem; raro, só quando um arquivo substitui outro já somado
+        """
+        self._registros = 0
+        self._dados_por_empresa = {}
+        self._consolidacao = ConsolidacaoIncremental()
+        for posicao, registros in self._aceitos:
+            registros[:] = [dado for dado in registros if self._duplicatas.vale(dado, posicao)]
+            for dado in registros:
+                self._adicionar(dado)
+
+    def _armazenar(self, resultado, registros):
+        """
+        Grava no banco local o resultado de um arquivo ainda não armazenado;
+        registros de documentos já gravados por arquivos enviados antes são
+        substituídos e reconsolidados em ArmazenamentoDados.ingerir
+        """
+        if self._armazenamento is None or resultado.hash is None:
+            return
+        try:
+            self._armazenamento.ingerir(resultado.hash, resultado.nome, resultado.tipo_detectado, registros)
+        except Exception as e:
+            logger.error(f"Erro ao armazenar {resultado.nome}: {str(e)}")
+
+    def progresso(self):
+        """
+        Retorna: (arquivos processados, total de arquivos)
+        """
+        with self._lock:
+            return self._processados, self.total
+
+    @property
+    def registros(self):
+        """
+        Registros extraídos até agora, antes da consolidação
+        """
+        with self._lock:
+            return self._registros
+
+    @property
+    def versao(self):
+        """
+        Versão da consolidação: muda sempre que um arquivo altera os dados
+        consolidados, para a interface refazer a tabela só nessas horas
+        """
+        with self._lock:
+            return self._versao
+
+    def mensagens(self):
+        """
+        Avisos e erros por arquivo: lista de (nível, mensagem), nível "aviso" ou "erro"
+        """
+        with self._lock:
+            return list(self._mensagens)
+
+    def tipos_detectados(self):
+        with self._lock:
+            return dict(self._tipos_detectados)
+
+    def dados_consolidados(self):
+        """
+        Consolidação dos arquivos processados até agora; ao fim da tarefa é
+        calculada uma única vez e reaproveitada nos reruns seguintes
+        """
+        with self._lock:
+            if self._consolidados is not None:
+                return self._consolidados
+            return self._consolidacao.dados_consolidados()
+
+    def registros_da_empresa(self, empresa):
+        """
+        Registros originais de ENTRADAS e PGDAS de uma empresa (nome normalizado)
+        Retorna: (entradas, pgdas)
+        """
+        with self._lock:
+            grupo = self._dados_por_empresa.get(empresa)
+            if grupo is None:
+                return [], []
+            return list(grupo['entradas']), list(grupo['pgdas'])
+
+
+def _agrupar_por_empresa(dados_por_empresa, dado):
+    """
+    Adiciona o registro extraído ao agrupamento por empresa
+    A chave é o nome normalizado, o mesmo da tabela consolidada
+    """
+    empresa = normalizar_nome_empresa(dado["Empresa"])
+    if empresa not in dados_por_empresa:
+        dados_por_empresa[empresa] = {
+            'dados_empresa': {
+                'CNPJ': dado.get('CNPJ', 'Não encontrado'),
+                'Nome_Empresa': dado["Empresa"]
+            },
+            'entradas': [],
+            'pgdas': []
+        }
+    if dado["Tipo_Documento"] == "ENTRADAS":
+        dados_por_empresa[empresa]['entradas'].append(dado)
+    else:
+        dados_por_empresa[empresa]['pgdas'].append(dado)